@@ -5,9 +5,16 @@
 
 # --- 1. Import Necessary Libraries ---
 
+import os               # Reads optional settings from environment variables
 import streamlit as st  # The main library for building the web app UI
-import yfinance as yf   # The library for fetching financial data from Yahoo Finance
 import pandas as pd     # Used for data manipulation (though yfinance handles most of it)
+from statement_fetch import STATEMENT_LABELS, fetch_statements  # Concurrent, cached statement downloads
+from line_items import FIELD_LABELS, missing_fields, normalize  # Canonical line items and their aliases
+from xray_analysis import AMBER, GREEN, NA, RED, analyze_frame  # The ratio engine and its heuristic flags
+from ratio_engine import build_panel  # Stacks companies' statements into one panel
+from trends import DEFAULT_STREAK_LENGTH, STREAK_LABELS, STREAKS, compute_trends, summarize, update_trends  # Multi-year trends and streaks
+from instrumentation import Laps, reset as reset_timings, snapshot as timing_snapshot  # Per-stage timings for the debug panel
+from rule_engine import get_default_rules  # The heuristic rules and their thresholds (heuristics.json)
 
 # --- 2. Page Configuration ---
 # This sets the browser tab's title, icon, and the page layout.
@@ -18,33 +25,137 @@ st.set_page_config(
     layout="centered"
 )
 
-# --- 3. Helper Function ---
-# This function is crucial for making the app robust.
-# Financial statements don't always use the exact same name for a line item
-# (e.g., 'Revenue' vs 'Total Revenue'). This function tries a list of
-# possible keys to find the correct data.
-def safe_get(df, *keys):
+# --- 3. Cache Settings ---
+# Streamlit re-runs this whole script on every click. The cached stages below
+# are shared by every user of the same server, so a ticker that anyone has
+# already analysed is not fetched or recalculated again until it expires.
+# max_entries caps how many tickers are kept, which caps memory use.
+UI_CACHE_TTL = int(os.environ.get("XRAY_UI_CACHE_TTL", 3600))        # Seconds
+UI_CACHE_ENTRIES = int(os.environ.get("XRAY_UI_CACHE_ENTRIES", 256))  # Per stage
+
+# The heuristic rules (heuristics.json, or the file in XRAY_RULES_PATH). Each
+# verdict's message and document reference come from here, so the text always
+# matches the thresholds that produced the verdict.
+RULES = get_default_rules()
+
+# --- 4. Cached Stages ---
+# Each stage is a plain function of simple, hashable inputs (ticker, period,
+# statement vintage). Arguments starting with "_" are not part of the cache
+# key: the statements are identified by their vintage fingerprint instead.
+
+class TransientFetchError(Exception):
+    """Raised inside the cached fetch so that timeouts and empty statements are not cached."""
+
+    def __init__(self, fetched):
+        super().__init__(fetched.transient_errors())
+        self.fetched = fetched
+
+
+@st.cache_data(ttl=UI_CACHE_TTL, max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def _cached_fetch(ticker, period):
+    fetched = fetch_statements(ticker, period=period)
+    if fetched.transient_errors() or fetched.empty_statements():
+        # Raising keeps this result out of the cache, so the next run retries.
+        # Empty statements are retried too: Yahoo returns them when it
+        # throttles, and an hour of "no data" would hide a real company.
+        raise TransientFetchError(fetched)
+    return fetched
+
+
+def load_statements(ticker, period="annual"):
+    """Fetch a ticker's statements, reusing any earlier complete fetch."""
+    try:
+        return _cached_fetch(ticker.upper().strip(), period)
+    except TransientFetchError as e:
+        return e.fetched
+
+
+@st.cache_data(ttl=UI_CACHE_TTL, max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def run_xray(ticker, vintage, _statements):
     """
-    Safely get a value from a DataFrame row (Series) by trying multiple keys.
-    Returns None if all keys fail.
+    Normalize the statements and run the seven analyses. Returns
+    (normalized, xray); xray is None when no needed line item was found.
+    """
+    normalized = normalize(_statements)
+    xray = analyze_frame(normalized, ticker) if not normalized.empty else None
+    return normalized, xray
+
+
+@st.cache_resource(show_spinner=False)
+def trend_history():
+    """
+    The last trends calculated for each (ticker, period), with the panel they
+    came from. Shared by every user, so when a company reports a new year
+    only that year is added to the stored trends instead of recalculating
+    the whole history.
+    """
+    return {}
+
+
+@st.cache_data(ttl=UI_CACHE_TTL, max_entries=UI_CACHE_ENTRIES, show_spinner=False)
+def run_trends(ticker, period, vintage, _statements):
+    """
+    Compute the multi-period trends and their one-row summary. Returns
+    (trend, summary); summary is None when there is no usable period.
+    """
+    panel = build_panel({ticker: normalize(_statements)})
+    history = trend_history()
+    stored = history.pop((ticker, period), None)
+    if stored is None:
+        trend = compute_trends(panel)
+    else:
+        trend = update_trends(stored[0], stored[1], panel)
+    history[(ticker, period)] = (trend, panel)
+    # Keep memory bounded: forget the least recently updated tickers.
+    while len(history) > UI_CACHE_ENTRIES:
+        history.pop(next(iter(history)))
+    return trend, (summarize(trend).iloc[0] if len(trend) else None)
+
+# --- 5. Helper Functions ---
+# The first function hides an analysis when a statement it needs could not be
+# fetched, instead of letting the whole script stop. The second shows the
+# rule file's explanation of a verdict.
+def has_statements(fetched, *names):
+    """
+    Return True if every named statement was fetched. Otherwise show a note
+    explaining which statements are missing and return False.
     
     Parameters:
-    - df: The pandas Series (a row from a financial statement)
-    - *keys: A variable number of string keys to try (e.g., 'Revenue', 'Total Revenue')
+    - fetched: The FetchResult returned by fetch_statements()
+    - *names: Statement names to check (e.g., 'income_stmt', 'cash_flow')
     """
-    for key in keys:
-        try:
-            # Try to access the value using the key
-            val = df[key]
-            # If successful, return the value immediately
-            return val
-        except KeyError:
-            # If the key doesn't exist, ignore the error and try the next key
-            continue
-    # If all keys have failed, return None to signify no data was found
-    return None
-
-# --- 4. Main Application UI ---
+    missing = fetched.missing(*names)
+    if missing:
+        labels = ", ".join(STATEMENT_LABELS[name] for name in missing)
+        st.info(f"Skipped: this analysis needs the {labels}, which could not be retrieved.")
+        return False
+    return True
+
+
+def show_verdict(xray, analysis):
+    """
+    Show the explanation of an analysis verdict, colored by its severity.
+
+    Parameters:
+    - xray: The result row of analyze_frame()
+    - analysis: The rule id (e.g., 'liquidity'); nothing is shown when the
+      rule file has no such rule
+    """
+    if analysis not in RULES.analyses:
+        return
+    rule = RULES.rule(analysis)
+    flag = xray.get(f"{analysis}_flag", NA)
+    source = f" ({rule.doc_ref})" if rule.doc_ref else ""
+    if flag == RED:
+        st.error(f"🔴 HEURISTIC WARNING{source}: {rule.message(RED)}")
+    elif flag == AMBER:
+        st.warning(f"🟡 HEURISTIC NOTE{source}: {rule.message(AMBER)}")
+    elif flag == GREEN:
+        st.success(f"✅ HEURISTIC CHECK{source}: {rule.message(GREEN)}")
+    else:
+        st.warning(rule.message(NA))
+
+# --- 6. Main Application UI ---
 
 # st.title() displays the main title of the web app
 st.title("Financial X-Ray Tool 📈")
@@ -55,6 +166,15 @@ st.markdown("Enter a public company ticker (from Yahoo Finance) to automatically
 # and the second is the default value (e.g., "AAPL").
 ticker_symbol = st.text_input("Enter Ticker Symbol (e.g., AAPL, MSFT, TSLA)", "AAPL")
 
+# st.radio() lets the user pick one option. The trend section can use
+# annual statements (the default) or quarterly ones.
+trend_period = st.radio("Trend data", ["Annual", "Quarterly"], horizontal=True)
+
+# st.sidebar.checkbox() adds an option in the sidebar. When ticked, a table of
+# how long each stage took (downloads, normalizing, ratios, drawing) is shown
+# under the results.
+show_debug = st.sidebar.checkbox("Show performance debug panel")
+
 # st.button() creates a button. The code inside this 'if' block
 # will only run when the user clicks the button.
 if st.button("Run X-Ray Analysis"):
@@ -65,280 +185,223 @@ if st.button("Run X-Ray Analysis"):
         # st.spinner() shows a loading message while the data is being fetched.
         with st.spinner(f"Fetching data for {ticker_symbol.upper()}..."):
             try:
-                # --- 5. Data Fetching ---
+                # --- 7. Data Fetching ---
                 
-                # Create a Ticker object from yfinance
-                stock = yf.Ticker(ticker_symbol)
-
-                # Fetch the financial statements.
-                # .T transposes the data, making years the rows, which is easier to work with.
-                try:
-                    income_stmt_t = stock.income_stmt.T
-                    balance_sheet_t = stock.balance_sheet.T
-                    cash_flow_t = stock.cash_flow.T
-                except Exception as e:
+                # Fetch all three financial statements at the same time (through the
+                # local statement cache). Each one is fetched independently, so a
+                # missing statement only disables the analyses that need it.
+                # Reruns reuse the cached result (see load_statements above).
+                fetched = load_statements(ticker_symbol)
+
+                if not fetched.statements:
                     # This handles cases where the ticker is valid but has no statements
                     # (e.g., it's an ETF, index fund, or cryptocurrency).
                     st.error(f"Could not retrieve financial statements for {ticker_symbol.upper()}.")
-                    st.error(f"This ticker might be for an ETF, index, or cryptocurrency. Error details: {e}")
+                    st.error(f"This ticker might be for an ETF, index, or cryptocurrency. Error details: {fetched.errors}")
                     st.stop() # Stop the script from running further
 
-                # Check if the fetched data tables are empty.
-                if income_stmt_t.empty or balance_sheet_t.empty or cash_flow_t.empty:
-                    st.error(f"No financial data found for {ticker_symbol.upper()}. Please check the ticker.")
-                    st.stop() # Stop the script
-                
-                # Get the data for the most recent year and the prior year.
-                # .iloc[0] is the most recent year (row 0)
-                # .iloc[1] is the previous year (row 1)
-                try:
-                    current_year = income_stmt_t.iloc[0]
-                    prev_year = income_stmt_t.iloc[1]
-                    current_year_bs = balance_sheet_t.iloc[0]
-                    prev_year_bs = balance_sheet_t.iloc[1]
-                    current_year_cf = cash_flow_t.iloc[0]
-                except IndexError:
-                    # This error happens if there is only 1 year of data,
-                    # making trend analysis (.iloc[1]) impossible.
-                    st.error("Not enough historical data for trend analysis (need at least 2 years).")
+                # Warn about any statement that is missing, but keep going.
+                for name, reason in fetched.errors.items():
+                    st.warning(f"{STATEMENT_LABELS[name]} unavailable ({reason}). Analyses that need it are skipped.")
+
+                # Show how long each download took, to spot a slow Yahoo endpoint.
+                with st.expander("Data fetch timings"):
+                    for name, seconds in fetched.timings.items():
+                        st.write(f"**{STATEMENT_LABELS[name]}:** {seconds:.2f}s")
+
+                # --- 8. Run Analysis ---
+                # Resolve the line items the X-Ray needs (e.g., 'Revenue' vs
+                # 'Total Revenue') once, so every later read is a plain column.
+                # The ratio engine then calculates every ratio and heuristic flag
+                # in one pass. Anything it cannot calculate (missing data, zero or
+                # negative denominators) comes back as NaN with an "n/a" flag.
+                # Both steps are cached per ticker and statement vintage.
+                normalized, xray = run_xray(fetched.ticker, fetched.vintage, fetched.statements)
+                if xray is None:
+                    st.error(f"None of the line items the X-Ray needs were found for {ticker_symbol.upper()}.")
                     st.stop()
+                missing = missing_fields(normalized)
+                if missing:
+                    st.caption("Line items not reported: " + ", ".join(FIELD_LABELS[field] for field in missing))
+
+                # With a single year of data there is nothing to compare against,
+                # so the trend checks are skipped but the snapshot still runs.
+                if len(normalized) < 2:
+                    st.info("Only one year of data is available: showing a single-year snapshot. Trend checks are skipped.")
 
                 # Display a header with the company name and the year of analysis.
-                # current_year.name is the index of the row, which is the year (e.g., 2023)
-                st.header(f"Analysis for {ticker_symbol.upper()} ({current_year.name.year})", divider="rainbow")
+                st.header(f"Analysis for {ticker_symbol.upper()} ({xray['fiscal_year']})", divider="rainbow")
 
-                # --- 6. Run Analysis & Display Results ---
-                # Each analysis is wrapped in its own 'try/except' block.
-                # This prevents the *entire* app from crashing if one ratio fails
-                # (e.g., due to missing data for just that ratio).
+                # --- 9. Display Results ---
+                # Each analysis is only shown when the statements it needs were
+                # fetched (see has_statements above). The time spent drawing each
+                # section is recorded for the debug panel.
+                render = Laps()
 
                 # --- Analysis 1: Cash Conversion Ratio (Balance Sheet Doc, Pg 6 / Income Stmt Doc, Pg 3) ---
+                render.start("render.cash_conversion")
                 st.subheader("1. Cash Conversion Ratio (Earnings Quality)")
-                try:
-                    # Get the data points using our safe_get helper function
-                    net_income = safe_get(current_year, 'Net Income')
-                    cfo = safe_get(current_year_cf, 'Operating Cash Flow', 'Total Cash From Operating Activities')
-
-                    # Check if we have the data (is not None) and if Net Income is positive
-                    if net_income is not None and cfo is not None and net_income > 0:
-                        # Calculate the ratio
-                        ratio = cfo / net_income
+                if has_statements(fetched, "income_stmt", "cash_flow"):
+                    if pd.notna(xray["cash_conversion"]):
                         # st.metric() displays a key number prominently
-                        st.metric(label="Cash Conversion Ratio (CFO / Net Income)", value=f"{ratio:.2f}")
+                        st.metric(label="Cash Conversion Ratio (CFO / Net Income)", value=f"{xray['cash_conversion']:.2f}")
 
                         # st.write() displays supporting data
-                        st.write(f"**Net Income:** ${net_income:,.0f}")
-                        st.write(f"**Operating Cash Flow:** ${cfo:,.0f}")
+                        st.write(f"**Net Income:** ${xray['net_income']:,.0f}")
+                        st.write(f"**Operating Cash Flow:** ${xray['operating_cash_flow']:,.0f}")
 
-                        # Apply the heuristic from the document
-                        if ratio < 0.8:
-                            st.error("🔴 HEURISTIC WARNING (Doc 1, Pg 6 / Doc 2, Pg 3): Ratio is below 0.8. This is a red flag. Cash flow is not keeping up with reported profits.")
-                        else:
-                            st.success("✅ HEURISTIC CHECK: Ratio is healthy. Cash flows are keeping pace with Net Income.")
-                    else:
-                        st.warning("Could not calculate: Net Income was zero, negative, or data was missing.")
-
-                except Exception as e:
-                    st.error(f"An error occurred during Cash Conversion analysis: {e}")
+                    # Apply the heuristic from the document
+                    show_verdict(xray, "cash_conversion")
 
                 # --- Analysis 2: Current Ratio (Balance Sheet Doc, Pg 1) ---
+                render.start("render.liquidity")
                 st.subheader("2. Current Ratio (Liquidity)")
-                try:
-                    current_assets = safe_get(current_year_bs, 'Current Assets', 'Total Current Assets')
-                    current_liabilities = safe_get(current_year_bs, 'Current Liabilities', 'Total Current Liabilities')
-
-                    # Check if data is not None and liabilities are greater than 0
-                    if current_assets is not None and current_liabilities is not None and current_liabilities > 0:
-                        ratio = current_assets / current_liabilities
-                        st.metric(label="Current Ratio (Assets / Liabilities)", value=f"{ratio:.2f}")
-
-                        st.write(f"**Current Assets:** ${current_assets:,.0f}")
-                        st.write(f"**Current Liabilities:** ${current_liabilities:,.0f}")
-
-                        if ratio < 1.0:
-                            st.error("🔴 HEURISTIC WARNING (Doc 1, Pg 1): Ratio is below 1.0. This is a 'clear red flag' suggesting potential liquidity risk.")
-                        elif ratio > 3.0:
-                            st.warning("🟡 HEURISTIC NOTE (Doc 1, Pg 1): Ratio is high (>3.0). This might indicate inefficient use of assets (e.g., inventory sitting idle).")
-                        else:
-                            st.success("✅ HEURISTIC CHECK: Ratio is in the healthy 1.0 - 3.0 range.")
-                    else:
-                        st.warning("Could not calculate: Current Liabilities were zero or data was missing.")
-                
-                except Exception as e:
-                    st.error(f"An error occurred during Liquidity analysis: {e}")
-                
+                if has_statements(fetched, "balance_sheet"):
+                    if pd.notna(xray["current_ratio"]):
+                        st.metric(label="Current Ratio (Assets / Liabilities)", value=f"{xray['current_ratio']:.2f}")
+
+                        st.write(f"**Current Assets:** ${xray['current_assets']:,.0f}")
+                        st.write(f"**Current Liabilities:** ${xray['current_liabilities']:,.0f}")
+
+                    show_verdict(xray, "liquidity")
+
                 # --- Analysis 3: Revenue Quality (Income Stmt Doc, Pg 1) ---
+                render.start("render.revenue_quality")
                 st.subheader("3. Revenue Quality (Receivables)")
-                try:
-                    # We need data from the current AND previous year for this trend analysis
-                    revenue_cy = safe_get(current_year, 'Total Revenue', 'Revenue')
-                    revenue_py = safe_get(prev_year, 'Total Revenue', 'Revenue')
-                    receivables_cy = safe_get(current_year_bs, 'Accounts Receivable', 'Receivables', 'Net Receivables')
-                    receivables_py = safe_get(prev_year_bs, 'Accounts Receivable', 'Receivables', 'Net Receivables')
-
-                    # Check if all values were found (are not None)
-                    if all([revenue_cy is not None, revenue_py is not None, receivables_cy is not None, receivables_py is not None]):
-                        # Now check if values are valid for calculation
-                        if revenue_py > 0 and receivables_py > 0:
-                            # Calculate the year-over-year growth rates
-                            revenue_growth = (revenue_cy - revenue_py) / revenue_py
-                            receivables_growth = (receivables_cy - receivables_py) / receivables_py
-
-                            st.metric(label="Revenue Growth", value=f"{revenue_growth:,.1%}")
-                            st.metric(label="Receivables Growth", value=f"{receivables_growth:,.1%}")
-
-                            # Apply the heuristic
-                            if receivables_growth > revenue_growth:
-                                st.error("🔴 HEURISTIC WARNING (Doc 2, Pg 1): Receivables are growing faster than revenue. This is a red flag for 'channel stuffing' or aggressive revenue recognition.")
-                            else:
-                                st.success("✅ HEURISTIC CHECK: Revenue is growing faster than receivables. This is a healthy sign.")
-                        else:
-                            st.warning("Could not calculate trend: Previous year Revenue or Receivables were zero or negative.")
-                    else:
-                        st.warning("Could not calculate: Missing data for Revenue or Receivables for trend analysis.")
+                if has_statements(fetched, "income_stmt", "balance_sheet"):
+                    # This trend analysis needs the current AND previous year
+                    if pd.notna(xray["revenue_growth"]) and pd.notna(xray["receivables_growth"]):
+                        st.metric(label="Revenue Growth", value=f"{xray['revenue_growth']:,.1%}")
+                        st.metric(label="Receivables Growth", value=f"{xray['receivables_growth']:,.1%}")
 
-                except Exception as e:
-                    st.error(f"An error occurred during Revenue Quality analysis: {e}")
+                    # Apply the heuristic
+                    show_verdict(xray, "revenue_quality")
 
                 # --- Analysis 4: Gross Margin (Income Stmt Doc, Pg 1) ---
+                render.start("render.gross_margin")
                 st.subheader("4. Gross Margin Analysis")
-                try:
-                    revenue_cy = safe_get(current_year, 'Total Revenue', 'Revenue')
-                    gross_profit_cy = safe_get(current_year, 'Gross Profit')
-                    
-                    if revenue_cy is not None and gross_profit_cy is not None and revenue_cy > 0:
-                        # Calculate current year's margin
-                        gross_margin_cy = gross_profit_cy / revenue_cy
-                        st.metric(label=f"Gross Margin ({current_year.name.year})", value=f"{gross_margin_cy:.1%}")
-
-                        # Check trend vs. previous year
-                        gross_profit_py = safe_get(prev_year, 'Gross Profit')
-                        revenue_py = safe_get(prev_year, 'Total Revenue', 'Revenue')
-                        
-                        if revenue_py is not None and gross_profit_py is not None and revenue_py > 0:
-                            gross_margin_py = gross_profit_py / revenue_py
-                            st.write(f"**Previous Year Margin:** {gross_margin_py:.1%}")
-                            
-                            # Apply the heuristic
-                            if gross_margin_cy > gross_margin_py:
-                                st.success("✅ HEURISTIC CHECK (Doc 2, Pg 1): Gross Margin is rising. This indicates pricing power or a competitive advantage.")
-                            else:
-                                st.warning("🟡 HEURISTIC NOTE (Doc 2, Pg 1): Gross Margin is stable or falling. Monitor this trend.")
-                    else:
-                        st.warning("Could not calculate: Missing data for Gross Profit or Revenue.")
-                
-                except Exception as e:
-                    st.error(f"An error occurred during Gross Margin analysis: {e}")
+                if has_statements(fetched, "income_stmt"):
+                    if pd.notna(xray["gross_margin"]):
+                        st.metric(label=f"Gross Margin ({xray['fiscal_year']})", value=f"{xray['gross_margin']:.1%}")
+
+                    # Check trend vs. previous year
+                    if pd.notna(xray["gross_margin_prev"]):
+                        st.write(f"**Previous Year Margin:** {xray['gross_margin_prev']:.1%}")
+
+                    # Apply the heuristic
+                    show_verdict(xray, "gross_margin")
 
                 # --- Analysis 5: Operating Expenses (Income Stmt Doc, Pg 2) ---
+                render.start("render.operating_expenses")
                 st.subheader("5. Operating Expense Analysis")
-                try:
-                    revenue_cy = safe_get(current_year, 'Total Revenue', 'Revenue')
-                    sga_cy = safe_get(current_year, 'Selling General Administrative')
-                    rd_cy = safe_get(current_year, 'Research Development')
-
-                    if revenue_cy is not None and revenue_cy > 0:
+                if has_statements(fetched, "income_stmt"):
+                    if pd.notna(xray["total_revenue"]) and xray["total_revenue"] > 0:
                         # Analyze SG&A as a percentage of revenue
-                        if sga_cy is not None:
-                            sga_ratio = sga_cy / revenue_cy
-                            st.metric(label="SG&A as % of Revenue", value=f"{sga_ratio:.1%}")
-                            if sga_ratio > 0.5:
-                                st.warning("🟡 HEURISTIC NOTE (Doc 2, Pg 2): SG&A is >50% of revenue. This is high, typical for some high-growth SaaS, but could signal inefficiency.")
-                        
+                        if pd.notna(xray["sga_ratio"]):
+                            st.metric(label="SG&A as % of Revenue", value=f"{xray['sga_ratio']:.1%}")
+
                         # Analyze R&D as a percentage of revenue
-                        if rd_cy is not None:
-                            rd_ratio = rd_cy / revenue_cy
-                            st.metric(label="R&D as % of Revenue", value=f"{rd_ratio:.1%}")
-                        
+                        if pd.notna(xray["rd_ratio"]):
+                            st.metric(label="R&D as % of Revenue", value=f"{xray['rd_ratio']:.1%}")
+
                         # Analyze Operating Leverage (Revenue Growth vs. SG&A Growth)
-                        sga_py = safe_get(prev_year, 'Selling General Administrative')
-                        revenue_py = safe_get(prev_year, 'Total Revenue', 'Revenue')
-                        
-                        # **BUG FIX HERE:** Check all variables for None *before* comparison
-                        if all([sga_cy is not None, sga_py is not None, revenue_cy is not None, revenue_py is not None]):
-                            if sga_py > 0 and revenue_py > 0:
-                                revenue_growth = (revenue_cy - revenue_py) / revenue_py
-                                sga_growth = (sga_cy - sga_py) / sga_py
-                                
-                                st.write(f"**Revenue Growth:** {revenue_growth:.1%}")
-                                st.write(f"**SG&A Growth:** {sga_growth:.1%}")
-                                
-                                # Apply heuristic
-                                if revenue_growth > sga_growth:
-                                    st.success("✅ HEURISTIC CHECK (Doc 2, Pg 2): Revenue is growing faster than SG&A. This shows positive operating leverage.")
-                                else:
-                                    st.warning("🟡 HEURISTIC NOTE (Doc 2, Pg 2): SG&A is growing faster than revenue. This indicates 'cost creep' and negative leverage.")
-                            else:
-                                st.write("Could not calculate operating leverage trend: Previous year SG&A or Revenue was zero or negative.")
+                        if pd.notna(xray["revenue_growth"]) and pd.notna(xray["sga_growth"]):
+                            st.write(f"**Revenue Growth:** {xray['revenue_growth']:.1%}")
+                            st.write(f"**SG&A Growth:** {xray['sga_growth']:.1%}")
                         else:
-                             st.write("Could not calculate operating leverage trend: Missing data for SG&A or Revenue.")
-                    else:
-                         st.warning("Could not calculate: Missing data for Revenue.")
+                            st.write("Could not calculate operating leverage trend: SG&A or Revenue was missing, or the previous year's values were zero or negative.")
 
-                except Exception as e:
-                    st.error(f"An error occurred during Operating Expense analysis: {e}")
+                    # Apply heuristic (SG&A level and operating leverage together)
+                    show_verdict(xray, "operating_expenses")
 
                 # --- Analysis 6: Profitability & Debt (Income Stmt Doc, Pg 3) ---
+                render.start("render.debt_coverage")
                 st.subheader("6. Profitability & Debt Coverage")
-                try:
-                    ebit = safe_get(current_year, 'EBIT', 'Operating Income')
-                    revenue_cy = safe_get(current_year, 'Total Revenue', 'Revenue')
-                    interest_expense = safe_get(current_year, 'Interest Expense')
-
-                    # Calculate EBIT Margin
-                    if ebit is not None and revenue_cy is not None and revenue_cy > 0:
-                        ebit_margin = ebit / revenue_cy
-                        st.metric(label="EBIT Margin", value=f"{ebit_margin:.1%}")
-                    
-                    # Calculate Interest Coverage Ratio
-                    if ebit is not None and interest_expense is not None and interest_expense != 0:
-                        # yfinance reports interest expense as a negative number, so we use abs()
-                        interest_expense_val = abs(interest_expense) 
-                        coverage_ratio = ebit / interest_expense_val
-                        st.metric(label="Interest Coverage Ratio (EBIT / Interest)", value=f"{coverage_ratio:.1f}x")
-
-                        # Apply heuristic
-                        if coverage_ratio < 2.0:
-                            st.error("🔴 HEURISTIC WARNING (Doc 2, Pg 3): Interest Coverage is below 2x. This is a major warning sign for financial distress.")
-                        else:
-                            st.success("✅ HEURISTIC CHECK: Interest Coverage is healthy.")
-                    
-                    if not (ebit is not None and revenue_cy is not None and interest_expense is not None):
-                        st.warning("Could not calculate: Missing data for EBIT, Revenue, or Interest Expense.")
+                if has_statements(fetched, "income_stmt"):
+                    # EBIT Margin
+                    if pd.notna(xray["ebit_margin"]):
+                        st.metric(label="EBIT Margin", value=f"{xray['ebit_margin']:.1%}")
 
-                except Exception as e:
-                    st.error(f"An error occurred during Profitability analysis: {e}")
+                    # Interest Coverage Ratio
+                    if pd.notna(xray["interest_coverage"]):
+                        st.metric(label="Interest Coverage Ratio (EBIT / Interest)", value=f"{xray['interest_coverage']:.1f}x")
+
+                    # Apply heuristic
+                    show_verdict(xray, "debt_coverage")
 
                 # --- Analysis 7: Accrual Ratio (Income Stmt Doc, Pg 4) ---
+                render.start("render.accruals")
                 st.subheader("7. Accrual Ratio (Earnings Quality)")
-                try:
+                if has_statements(fetched, "income_stmt", "balance_sheet", "cash_flow"):
                     # This ratio uses data from all three statements
-                    net_income = safe_get(current_year, 'Net Income')
-                    cfo = safe_get(current_year_cf, 'Operating Cash Flow', 'Total Cash From Operating Activities')
-                    total_assets = safe_get(current_year_bs, 'Total Assets')
-
-                    if all([net_income is not None, cfo is not None, total_assets is not None]) and total_assets > 0:
-                        # Calculate the ratio
-                        accrual_ratio = (net_income - cfo) / total_assets
-                        st.metric(label="Accrual Ratio ((NI - CFO) / Total Assets)", value=f"{accrual_ratio:.2%}")
-
-                        # Apply heuristic
-                        if accrual_ratio > 0.05: # Using 5% as a "high positive" heuristic
-                            st.error("🔴 HEURISTIC WARNING (Doc 2, Pg 4): Accrual Ratio is high and positive. This is a red flag for 'paper profits' and poor earnings quality.")
-                        else:
-                            st.success("✅ HEURISTIC CHECK: Accrual Ratio is low or negative, suggesting earnings are backed by cash.")
-                    else:
-                        st.warning("Could not calculate: Missing data for Net Income, CFO, or Total Assets.")
+                    if pd.notna(xray["accrual_ratio"]):
+                        st.metric(label="Accrual Ratio ((NI - CFO) / Total Assets)", value=f"{xray['accrual_ratio']:.2%}")
+
+                    # Apply heuristic (the rule file's "high positive" threshold, 5% by default)
+                    show_verdict(xray, "accruals")
+
+                # --- Analysis 8: Multi-Year Trends ---
+                render.start("render.trends")
+                st.subheader("8. Multi-Year Trends")
+                if trend_period == "Quarterly":
+                    trend_fetched = load_statements(ticker_symbol, period="quarterly")
+                else:
+                    trend_fetched = fetched
+
+                # Every ratio for every period, plus changes and warning streaks.
+                trend, summary = run_trends(fetched.ticker, trend_period, trend_fetched.vintage, trend_fetched.statements)
+                period_word = "quarters" if trend_period == "Quarterly" else "years"
+
+                if summary is None or len(trend) < 2:
+                    st.info("Only one period of data is available, so there is no trend to show.")
+                else:
+                    st.write(f"**Periods analysed:** {summary['periods']} {period_word}")
+
+                    # Compound annual growth rates over the whole history
+                    col1, col2 = st.columns(2)
+                    if pd.notna(summary["total_revenue_cagr"]):
+                        col1.metric(label="Revenue CAGR", value=f"{summary['total_revenue_cagr']:.1%}")
+                    if pd.notna(summary["net_income_cagr"]):
+                        col2.metric(label="Net Income CAGR", value=f"{summary['net_income_cagr']:.1%}")
+
+                    # The ratios over time (periods as columns, newest first)
+                    table = trend.droplevel("ticker")[["cash_conversion", "current_ratio", "revenue_growth", "receivables_growth",
+                                                      "gross_margin", "ebit_margin", "interest_coverage", "accrual_ratio"]]
+                    table.index = table.index.strftime("%Y-%m-%d")
+                    st.dataframe(table.iloc[::-1].T.round(3))
+
+                    # Apply the streak heuristics
+                    streaks_found = False
+                    for name in STREAKS:
+                        if summary[f"{name}_streak_flag"] == RED:
+                            streaks_found = True
+                            st.error(f"🔴 TREND WARNING: {STREAK_LABELS[name]} for {summary[f'{name}_streak']} {period_word} in a row.")
+                    if not streaks_found:
+                        st.success(f"✅ TREND CHECK: No warning sign has persisted for {DEFAULT_STREAK_LENGTH} or more {period_word} in a row.")
+                render.stop()
 
-                except Exception as e:
-                    st.error(f"An error occurred during Accrual Ratio analysis: {e}")
-            
             # --- General Error Handling ---
             except Exception as e:
                 # This is a catch-all for any other error (e.g., invalid ticker, network issue)
                 st.error(f"Failed to process ticker {ticker_symbol.upper()}. Is it a valid symbol?")
                 st.error(f"Error details: {e}")
 
-# --- 7. Footer ---
+# --- 10. Performance Debug Panel ---
+# Wall time and call counts per stage, added up since the server started (or
+# since the last reset) for every user of this server. Cached stages only
+# count when they actually run, so a rerun of the same ticker mostly shows
+# drawing time.
+if show_debug:
+    with st.expander("Performance (debug)", expanded=True):
+        timings = timing_snapshot()
+        if timings:
+            st.dataframe(pd.DataFrame(timings).set_index("stage"))
+        else:
+            st.write("No stages recorded yet. Run an X-Ray first.")
+        if st.button("Reset timings"):
+            reset_timings()
+            st.rerun()
+
+# --- 11. Footer ---
 st.markdown("---")
 st.caption("This tool is for educational purposes only, based on financial heuristics from your documents. Data is sourced from Yahoo Finance and is not financial advice.")
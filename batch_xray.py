@@ -0,0 +1,192 @@
+# This module screens a whole list of tickers (a watchlist, or a universe like
+# the S&P 500) instead of one ticker at a time.
+#
+# Tickers are processed by a bounded pool of worker threads. A rate limiter
+# keeps us from hammering Yahoo Finance, failed downloads are retried with
+# exponential backoff (an empty statement is retried once, since Yahoo
+# returns empty frames when it throttles), and results are yielded as soon
+# as each ticker finishes, so a table can fill in while the slow ones are
+# still running.
+#
+# Use it from the Streamlit "Batch X-Ray" page, or from a terminal:
+#   python batch_xray.py AAPL MSFT TSLA
+#   python batch_xray.py --file sp500.txt --workers 16 --output results.csv
+#   python batch_xray.py --source local:./snapshot --rate 0 --output nightly.csv
+
+# --- 1. Import Necessary Libraries ---
+
+import argparse
+import csv
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from data_sources import source_from_spec
+from statement_fetch import fetch_pool, fetch_statements
+from xray_analysis import ANALYSES, RATIOS, analyze
+
+# --- 2. Configuration ---
+
+DEFAULT_WORKERS = 8        # Tickers processed at the same time
+DEFAULT_RATE = 4.0         # Ticker fetches started per second (all workers combined)
+DEFAULT_RETRIES = 3        # Extra attempts after a failed fetch
+DEFAULT_BACKOFF = 1.0      # Seconds before the first retry; doubles each time
+
+# Column order for tables and CSV output.
+COLUMNS = (
+    ["ticker", "fiscal_year"]
+    + [f"{name}_flag" for name in ANALYSES]
+    + list(RATIOS)
+    + ["missing_fields", "seconds", "error"]
+)
+
+
+# --- 3. Rate Limiter ---
+
+class RateLimiter:
+    """
+    A simple thread-safe rate limiter: acquire() blocks so that calls are
+    spaced at least 1/rate seconds apart across all threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+# --- 4. Screening ---
+
+def xray_ticker(ticker, limiter=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, source=None,
+                executor=None):
+    """
+    Fetch and analyse one ticker, retrying failed downloads. `source` is the
+    DataSource to read from (default: the configured one) and `executor` the
+    thread pool for its statement downloads (default: the shared one).
+
+    Returns one result row (a dict with the keys in COLUMNS). Errors are
+    reported in the 'error' column instead of being raised.
+    """
+    start = time.perf_counter()
+    row = {"ticker": ticker.upper().strip()}
+
+    retried_empty = False
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        fetched = fetch_statements(ticker, source=source, executor=executor)
+        if attempt == retries:
+            break
+        if fetched.transient_errors():
+            # Timeouts and network errors are worth every retry.
+            pass
+        elif fetched.empty_statements() and not retried_empty:
+            # An empty statement is usually an ETF or index, but may be Yahoo
+            # throttling: one more try after the pause tells them apart.
+            retried_empty = True
+        else:
+            break
+        time.sleep(backoff * (2 ** attempt))
+
+    if fetched.statements:
+        row.update(analyze(fetched.statements))
+    if fetched.errors:
+        row["error"] = "; ".join(f"{name}: {reason}" for name, reason in fetched.errors.items())
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def run_batch(tickers, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+              retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, source=None):
+    """
+    Screen many tickers in parallel, yielding each result row as it finishes.
+
+    Parameters:
+    - tickers: Iterable of ticker symbols (duplicates and blanks are ignored)
+    - workers: Number of tickers processed at the same time
+    - rate: Maximum ticker fetches started per second (0 for no limit)
+    - retries: Extra attempts for a ticker whose download failed
+    - backoff: Seconds before the first retry; doubles on each retry
+    - source: DataSource to read from (default: the configured one)
+    """
+    unique = list(dict.fromkeys(t.upper().strip() for t in tickers if t and t.strip()))
+    limiter = RateLimiter(rate)
+    # Each worker gets its own three download threads, so `workers` really is
+    # the number of tickers fetched at once.
+    downloads = fetch_pool(workers)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xray-batch")
+
+    try:
+        futures = {
+            pool.submit(xray_ticker, ticker, limiter, retries, backoff, source, downloads): ticker
+            for ticker in unique
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {"ticker": futures[future], "error": str(e)}
+    finally:
+        # Runs when the batch finishes and also when the caller stops early
+        # (Ctrl-C, or the Streamlit page being left or re-run): tickers still
+        # queued are cancelled instead of being screened for nobody, and we
+        # don't wait for downloads that already timed out.
+        pool.shutdown(wait=False, cancel_futures=True)
+        downloads.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_tickers(text):
+    """Split pasted text or file contents (commas, spaces or new lines) into tickers."""
+    return [t for t in text.replace(",", " ").split() if t]
+
+
+# --- 5. Command Line Interface ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Financial X-Ray on a list of tickers.")
+    parser.add_argument("tickers", nargs="*", help="Ticker symbols (e.g., AAPL MSFT)")
+    parser.add_argument("-f", "--file", help="Text file with tickers (commas, spaces or one per line)")
+    parser.add_argument("-o", "--output", help="CSV file to write (default: print to the terminal)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("-r", "--rate", type=float, default=DEFAULT_RATE,
+                        help="Maximum ticker fetches per second (0 for no limit)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--source", help="'yfinance' or 'local:<snapshot directory>' (default: XRAY_DATA_SOURCE)")
+    args = parser.parse_args(argv)
+    source = source_from_spec(args.source) if args.source else None
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file) as f:
+            tickers += parse_tickers(f.read())
+    if not tickers and source is not None:
+        # A local snapshot can list its own tickers: screen all of them.
+        tickers = source.tickers() or []
+    if not tickers:
+        parser.error("no tickers given")
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        # Rows are written (and flushed) as each ticker finishes.
+        for row in run_batch(tickers, workers=args.workers, rate=args.rate,
+                             retries=args.retries, source=source):
+            writer.writerow(row)
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
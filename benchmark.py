@@ -0,0 +1,278 @@
+# This script measures how fast the X-Ray is, without touching the network.
+#
+# It replays recorded statements instead of downloading them, so every run
+# does exactly the same work and results can be compared between commits:
+#   - single-ticker latency: one full X-Ray report (fetch legs, transposes,
+#     normalize, ratio engine), repeated to get the median and 95th percentile
+#   - batch throughput: run_batch() and the vectorized screen() over 1, 100
+#     and 5,000 tickers
+#   - memory per company of the raw statements versus the CompactStore
+#   - peak memory of each run, measured with tracemalloc
+#   - the per-stage wall time and call counts from instrumentation.py
+#
+# The recorded statements come from a snapshot directory (see
+# data_sources.py), e.g. one recorded from Yahoo Finance with
+#   python data_sources.py snapshot ./fixtures AAPL MSFT KO ...
+# Without --fixtures, a synthetic snapshot in the same layout and with the
+# same line-item names as Yahoo is recorded to a temporary directory.
+# Larger universes reuse the recorded companies under new ticker names.
+#
+# Run it with:
+#   python benchmark.py
+#   python benchmark.py --fixtures ./fixtures --sizes 1 100 --json bench.json
+
+# --- 1. Import Necessary Libraries ---
+
+import argparse
+import json
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from batch_xray import run_batch
+from compact_store import PRECISIONS, load_universe
+from data_sources import DataSource, LocalSource, save_snapshot
+from line_items import LINE_ITEMS
+from ratio_engine import screen
+from statement_fetch import STATEMENTS, fetch_statements
+from xray_api import xray
+
+# --- 2. Configuration ---
+
+DEFAULT_SIZES = (1, 100, 5000)   # Batch sizes to measure
+DEFAULT_REPEAT = 50              # Single-ticker runs used for the latency figures
+DEFAULT_COMPANIES = 50           # Companies in the synthetic snapshot
+DEFAULT_YEARS = 4                # Fiscal years per synthetic company
+
+# Yahoo statements carry many line items the X-Ray never reads; the synthetic
+# statements pad themselves to roughly the same size so normalize() does
+# realistic work.
+PADDING_ROWS = {"income_stmt": 35, "balance_sheet": 60, "cash_flow": 45}
+
+
+# --- 3. Recorded Fixtures ---
+
+class SyntheticSource(DataSource):
+    """
+    Generates plausible statements in the yfinance layout for tickers named
+    'SYN000', 'SYN001', ... The numbers are random but fixed by the seed, and
+    companies alternate between the line-item aliases Yahoo uses.
+    """
+
+    def __init__(self, companies=DEFAULT_COMPANIES, years=DEFAULT_YEARS, seed=0):
+        self.companies = companies
+        self.years = years
+        self.seed = seed
+
+    def tickers(self):
+        return [f"SYN{i:03d}" for i in range(self.companies)]
+
+    def get_statement(self, ticker, statement, period="annual"):
+        number = int(ticker[3:])
+        rng = np.random.default_rng([self.seed, number, STATEMENTS.index(statement)])
+        dates = pd.date_range(end="2024-12-31", periods=self.years, freq="YE")[::-1]
+        scale = 10 ** rng.uniform(8, 11)
+        rows = {}
+        for field, (field_statement, aliases) in LINE_ITEMS.items():
+            if field_statement != statement:
+                continue
+            # Most companies use the first alias; some use the others.
+            alias = aliases[number % len(aliases)] if number % 3 == 0 else aliases[0]
+            values = scale * rng.uniform(0.05, 1.0) * np.cumprod(rng.uniform(0.9, 1.2, self.years))[::-1]
+            if field == "interest_expense":
+                values = -values / 20
+            rows[alias] = values
+        for i in range(PADDING_ROWS[statement]):
+            rows[f"Other Line Item {i}"] = scale * rng.uniform(-1, 1, self.years)
+        df = pd.DataFrame.from_dict(rows, orient="index", columns=dates)
+        # Yahoo leaves some cells empty.
+        df = df.mask(rng.random(df.shape) < 0.03)
+        return df
+
+
+class ReplaySource(DataSource):
+    """
+    Serves a universe of any size from a few recorded companies: ticker
+    'T00042' replays recorded company number 42 modulo the number recorded.
+    Statements are read from the snapshot once and then kept in memory, so
+    the benchmark measures the X-Ray rather than the disk.
+    """
+
+    def __init__(self, source, recorded):
+        self.source = source
+        self.recorded = list(recorded)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def universe(self, size):
+        return [f"T{i:05d}" for i in range(size)]
+
+    def get_statement(self, ticker, statement, period="annual"):
+        recorded = self.recorded[int(ticker[1:]) % len(self.recorded)]
+        key = (recorded, statement, period)
+        with self._lock:
+            if key not in self._frames:
+                self._frames[key] = self.source.get_statement(recorded, statement, period)
+            return self._frames[key]
+
+    def preload(self):
+        for ticker in self.universe(len(self.recorded)):
+            for statement in STATEMENTS:
+                self.get_statement(ticker, statement)
+
+
+# --- 4. Measuring ---
+
+def measure(func, trace_memory=True):
+    """
+    Run func() twice: once for wall time and per-stage timings, and once
+    under tracemalloc for peak memory (tracemalloc slows Python down, so the
+    two are kept apart).
+
+    Returns a dict with 'seconds', 'peak_mb' and 'stages'.
+    """
+    instrumentation.reset()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    result = {"seconds": round(seconds, 4), "peak_mb": None, "stages": instrumentation.snapshot()}
+
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            func()
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def bench_single(replay, repeat, trace_memory):
+    """Latency of one full X-Ray report, in milliseconds."""
+    fetch = partial(fetch_statements, source=replay)
+    xray("T00000", fetch=fetch)  # Warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        xray("T00000", fetch=fetch)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    result = measure(lambda: xray("T00000", fetch=fetch), trace_memory)
+    result.update({
+        "repeat": repeat,
+        "p50_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[int(0.95 * (len(times) - 1))], 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+    })
+    return result
+
+
+def bench_batch(replay, size, workers, trace_memory):
+    """run_batch() over `size` tickers: threads, fetch legs and one analysis per ticker."""
+    tickers = replay.universe(size)
+
+    def run():
+        rows = list(run_batch(tickers, workers=workers, rate=0, retries=0, source=replay))
+        assert len(rows) == size
+
+    result = measure(run, trace_memory)
+    result["tickers_per_second"] = round(size / result["seconds"], 1)
+    return result
+
+
+def bench_screen(replay, size, trace_memory):
+    """The vectorized screen(): every ticker's statements through one panel."""
+    statements = {
+        ticker: {name: replay.get_statement(ticker, name).T for name in STATEMENTS}
+        for ticker in replay.universe(size)
+    }
+
+    def run():
+        assert len(screen(statements)) == size
+
+    result = measure(run, trace_memory)
+    result["tickers_per_second"] = round(size / result["seconds"], 1)
+    return result
+
+
+def bench_compact(replay, size, workers):
+    """Bytes per company: raw transposed statements versus each CompactStore precision."""
+    recorded = replay.universe(len(replay.recorded))
+    raw = sum(
+        replay.get_statement(ticker, name).T.memory_usage(index=True, deep=True).sum()
+        for ticker in recorded for name in STATEMENTS
+    ) / len(recorded)
+    result = {"raw_bytes_per_company": round(raw)}
+    for precision in PRECISIONS:
+        store, _ = load_universe(replay.universe(size), source=replay, precision=precision, workers=workers)
+        result[f"{precision}_bytes_per_company"] = round(store.nbytes / max(len(store), 1))
+    return result
+
+
+# --- 5. Command Line Interface ---
+
+def _print_stages(stages, limit=8):
+    for row in stages[:limit]:
+        print(f"      {row['stage']:<28} {row['calls']:>7} calls {row['total_ms']:>11.1f} ms total {row['mean_ms']:>9.3f} ms mean")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Financial X-Ray on recorded statements.")
+    parser.add_argument("--fixtures", help="Snapshot directory of recorded statements (default: a synthetic one)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Batch sizes to measure")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Single-ticker runs")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Batch worker threads")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc runs")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.fixtures
+        if root is None:
+            synthetic = SyntheticSource()
+            root = tmp
+            save_snapshot(synthetic.tickers(), root, source=synthetic)
+        snapshot = LocalSource(root)
+        recorded = snapshot.tickers()
+        if not recorded:
+            parser.error(f"No recorded statements found in {root}")
+        replay = ReplaySource(snapshot, recorded)
+        replay.preload()
+
+        trace_memory = not args.no_memory
+        results = {"fixtures": args.fixtures or "synthetic", "companies": len(recorded), "batch": {}, "screen": {}}
+
+        print(f"Recorded companies: {len(recorded)} ({results['fixtures']})")
+        single = results["single"] = bench_single(replay, args.repeat, trace_memory)
+        print(f"Single ticker: p50 {single['p50_ms']:.2f} ms, p95 {single['p95_ms']:.2f} ms, "
+              f"peak {single['peak_mb']} MB")
+        _print_stages(single["stages"])
+
+        for size in args.sizes:
+            batch = results["batch"][size] = bench_batch(replay, size, args.workers, trace_memory)
+            print(f"Batch {size:>6}: {batch['seconds']:.2f}s, {batch['tickers_per_second']:.1f} tickers/s, "
+                  f"peak {batch['peak_mb']} MB")
+            _print_stages(batch["stages"])
+            vector = results["screen"][size] = bench_screen(replay, size, trace_memory)
+            print(f"Screen {size:>5}: {vector['seconds']:.2f}s, {vector['tickers_per_second']:.1f} tickers/s, "
+                  f"peak {vector['peak_mb']} MB")
+
+        compact = results["compact"] = bench_compact(replay, max(args.sizes), args.workers)
+        print("Memory per company: " + ", ".join(f"{key.replace('_bytes_per_company', '')} {value:,} B"
+                                                  for key, value in compact.items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# This module keeps a whole screening universe in memory in a compact form.
+#
+# Yahoo Finance returns wide statements with dozens to hundreds of line items
+# per company, stored as pandas objects. The X-Ray only reads the canonical
+# fields in line_items.FIELDS, so for universe-wide screens CompactStore
+# keeps just those: one row per (ticker, period) in a plain numeric array,
+# with tickers and periods stored as small integer codes. A company with
+# four years of data takes a few hundred bytes instead of tens of kilobytes,
+# so a whole-market panel fits comfortably in one worker.
+#
+#   store = load_universe(["AAPL", "MSFT", "KO"])
+#   ratios = compute_ratios(store.panel())
+#
+# Values are stored as float32 by default ("single" precision, about seven
+# significant digits, plenty for ratios). Use precision="double" to keep
+# float64 exactly as Yahoo reported it, e.g. when a ratio sits right on a
+# heuristic threshold.
+
+# --- 1. Import Necessary Libraries ---
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from line_items import FIELDS, normalize
+from statement_fetch import fetch_pool, fetch_statements
+
+# --- 2. Configuration ---
+
+# Storage dtype for each precision mode.
+PRECISIONS = {"single": np.float32, "double": np.float64}
+
+DEFAULT_PRECISION = "single"
+
+# Tickers fetched at the same time by load_universe().
+DEFAULT_WORKERS = 8
+
+
+# --- 3. The Store ---
+
+class CompactStore:
+    """
+    The canonical line items of many companies, as numeric arrays.
+
+    Rows are kept sorted by ticker code and then period. Each row has:
+    - a ticker code (int32), an index into `tickers`
+    - a period as days since 1970-01-01 (int32); the fiscal year is the
+      period's year
+    - one value per field in line_items.FIELDS (float32 or float64, NaN
+      where the field was not reported)
+
+    Parameters:
+    - precision: 'single' (float32, the default) or 'double' (float64)
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}. Use 'single' or 'double'.")
+        self.precision = precision
+        self.dtype = PRECISIONS[precision]
+        self.tickers = []      # code -> ticker
+        self._codes = {}       # ticker -> code
+        self._ticker_codes = np.empty(0, dtype=np.int32)
+        self._periods = np.empty(0, dtype=np.int32)
+        self._values = np.empty((0, len(FIELDS)), dtype=self.dtype)
+        # Rows added since the arrays were last rebuilt, and the tickers
+        # whose older rows they replace.
+        self._pending = []
+        self._replaced = set()
+        self._lock = threading.Lock()
+
+    # --- Adding companies ---
+
+    def add(self, ticker, normalized):
+        """
+        Store (or replace) a company's line items.
+
+        Parameters:
+        - ticker: The ticker symbol
+        - normalized: The frame returned by line_items.normalize() (periods
+          as rows, canonical fields as columns)
+        """
+        ticker = ticker.upper().strip()
+        frame = normalized.reindex(columns=list(FIELDS))
+        periods = pd.to_datetime(frame.index).values.astype("datetime64[D]").astype(np.int32)
+        values = frame.to_numpy(dtype=self.dtype)
+        with self._lock:
+            code = self._codes.get(ticker)
+            if code is None:
+                code = self._codes[ticker] = len(self.tickers)
+                self.tickers.append(ticker)
+            else:
+                self._replaced.add(code)
+                # A second add() before the next rebuild also replaces the first.
+                self._pending = [chunk for chunk in self._pending if chunk[0] != code]
+            self._pending.append((code, periods, values))
+
+    def _consolidate(self):
+        # Merge pending rows into the sorted arrays. Called with the lock held.
+        if not self._pending:
+            return
+        keep = ~np.isin(self._ticker_codes, list(self._replaced))
+        codes = [self._ticker_codes[keep]] + [np.full(len(p), c, dtype=np.int32) for c, p, _ in self._pending]
+        periods = [self._periods[keep]] + [p for _, p, _ in self._pending]
+        values = [self._values[keep]] + [v for _, _, v in self._pending]
+        codes, periods, values = np.concatenate(codes), np.concatenate(periods), np.concatenate(values)
+        order = np.lexsort((periods, codes))
+        self._ticker_codes, self._periods, self._values = codes[order], periods[order], values[order]
+        self._pending, self._replaced = [], set()
+
+    # --- Reading ---
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker.upper().strip() in self._codes
+
+    def arrays(self):
+        """Return the (ticker codes, periods, values) arrays, rows sorted."""
+        with self._lock:
+            self._consolidate()
+            return self._ticker_codes, self._periods, self._values
+
+    def get(self, ticker):
+        """
+        Return one company's line items as a float64 frame, like
+        line_items.normalize() does (an empty frame for an unknown ticker).
+        """
+        code = self._codes.get(ticker.upper().strip())
+        codes, periods, values = self.arrays()
+        if code is None:
+            return pd.DataFrame(columns=list(FIELDS), dtype="float64")
+        start, end = np.searchsorted(codes, [code, code + 1])
+        # Newest first, like the statements themselves.
+        index = pd.DatetimeIndex(periods[start:end].astype("datetime64[D]")[::-1])
+        return pd.DataFrame(values[start:end][::-1].astype(np.float64), index=index, columns=list(FIELDS))
+
+    def panel(self, tickers=None):
+        """
+        Return the stored data as a panel for ratio_engine.compute_ratios():
+        indexed by (ticker, period), one float64 column per canonical field.
+
+        Parameters:
+        - tickers: Only include these tickers (default: all of them)
+        """
+        codes, periods, values = self.arrays()
+        if tickers is not None:
+            wanted = [self._codes[t] for t in (t.upper().strip() for t in tickers) if t in self._codes]
+            rows = np.isin(codes, wanted)
+            codes, periods, values = codes[rows], periods[rows], values[rows]
+        names = np.asarray(self.tickers, dtype=object)
+        index = pd.MultiIndex.from_arrays(
+            [names[codes] if len(codes) else np.empty(0, dtype=object),
+             pd.DatetimeIndex(periods.astype("datetime64[D]"))],
+            names=["ticker", "period"],
+        )
+        # Calculations always run in float64, whatever the storage precision.
+        return pd.DataFrame(values.astype(np.float64), index=index, columns=list(FIELDS))
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the stored rows and ticker names, in bytes."""
+        codes, periods, values = self.arrays()
+        names = sum(len(t) + 49 for t in self.tickers)  # Size of a short Python str
+        return codes.nbytes + periods.nbytes + values.nbytes + names
+
+
+# --- 4. Loading a Universe ---
+
+def load_universe(tickers, source=None, period="annual", precision=DEFAULT_PRECISION,
+                  workers=DEFAULT_WORKERS, store=None):
+    """
+    Fetch many tickers and keep only their canonical line items.
+
+    Each company's raw statements are normalized as soon as they arrive and
+    then dropped, so memory stays at the size of the compact store rather
+    than the size of every downloaded statement.
+
+    Parameters:
+    - tickers: Iterable of ticker symbols
+    - source: DataSource to read from (default: the configured one)
+    - period: 'annual' or 'quarterly'
+    - precision: 'single' or 'double' (see CompactStore)
+    - workers: Tickers fetched at the same time
+    - store: An existing CompactStore to add to (default: a new one)
+
+    Returns (store, errors), where errors maps each ticker that could not be
+    loaded to the reasons from its FetchResult.
+    """
+    store = store if store is not None else CompactStore(precision)
+    unique = list(dict.fromkeys(t.upper().strip() for t in tickers if t and t.strip()))
+    errors = {}
+
+    def load(ticker):
+        fetched = fetch_statements(ticker, period=period, source=source, executor=downloads)
+        normalized = normalize(fetched.statements)
+        if normalized.empty:
+            errors[ticker] = fetched.errors or {"all": "no canonical line items found"}
+        else:
+            store.add(ticker, normalized)
+
+    downloads = fetch_pool(workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xray-universe") as pool:
+            list(pool.map(load, unique))
+    finally:
+        downloads.shutdown(wait=False, cancel_futures=True)
+    return store, errors
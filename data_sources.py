@@ -0,0 +1,275 @@
+# This module decides where financial statements come from.
+#
+# Every backend ("data source") answers the same question: give me this
+# statement for this ticker and period, as a raw DataFrame laid out the way
+# yfinance returns it (line items as rows, period end dates as columns).
+# The rest of the X-Ray never needs to know which backend answered.
+#
+# Backends:
+#   - YFinanceSource: downloads from Yahoo Finance.
+#   - CachedSource:   wraps another source with the StatementCache.
+#   - LocalSource:    reads a snapshot directory of CSV or Parquet files,
+#                     for offline, reproducible and disk-speed screens.
+#
+# The default source is picked with the XRAY_DATA_SOURCE environment
+# variable: "yfinance" (default, cached) or "local:/path/to/snapshot".
+# A snapshot can be recorded with:
+#   python data_sources.py snapshot ./snapshot AAPL MSFT --format parquet
+
+# --- 1. Import Necessary Libraries ---
+
+import argparse
+import os
+import threading
+
+import pandas as pd
+import yfinance as yf
+
+from instrumentation import stage
+from statement_cache import StatementCache, get_default_cache
+
+# --- 2. Configuration ---
+
+# Maps (statement, period) to the yfinance Ticker attribute that holds it.
+STATEMENT_ATTRIBUTES = {
+    ("income_stmt", "annual"): "income_stmt",
+    ("balance_sheet", "annual"): "balance_sheet",
+    ("cash_flow", "annual"): "cash_flow",
+    ("income_stmt", "quarterly"): "quarterly_income_stmt",
+    ("balance_sheet", "quarterly"): "quarterly_balance_sheet",
+    ("cash_flow", "quarterly"): "quarterly_cash_flow",
+}
+
+# Connections kept open per host by the shared Yahoo session.
+HTTP_POOL_SIZE = int(os.environ.get("XRAY_HTTP_POOL_SIZE", 32))
+
+# File formats LocalSource can read, in the order they are tried.
+LOCAL_FORMATS = ("parquet", "csv")
+
+
+# --- 3. Shared HTTP Session ---
+# Every download goes through one long-lived session, so connections (and
+# Yahoo's cookie/crumb handshake) are reused across tickers and requests
+# instead of being set up again each time.
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def yahoo_session():
+    """Return the process-wide HTTP session used for Yahoo Finance requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            try:
+                # Recent yfinance versions require a curl_cffi session.
+                from curl_cffi import requests as curl_requests
+                _session = curl_requests.Session(impersonate="chrome")
+            except ImportError:
+                import requests
+                from requests.adapters import HTTPAdapter
+                _session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                _session.mount("https://", adapter)
+        return _session
+
+
+# --- 4. Data Sources ---
+
+class DataSource:
+    """
+    The interface every backend implements.
+
+    get_statement() returns a raw statement (line items as rows, period end
+    dates as columns, newest first). An unknown ticker or a statement the
+    source does not have gives an empty DataFrame, like yfinance does.
+    """
+
+    def get_statement(self, ticker, statement, period="annual"):
+        raise NotImplementedError
+
+    def tickers(self):
+        """The tickers this source can list, or None if it cannot list them."""
+        return None
+
+
+class YFinanceSource(DataSource):
+    """Downloads statements from Yahoo Finance through the shared session."""
+
+    def get_statement(self, ticker, statement, period="annual"):
+        attribute = STATEMENT_ATTRIBUTES[(statement, period)]
+        with stage("yfinance.ticker"):
+            yf_ticker = yf.Ticker(ticker, session=yahoo_session())
+        # The download happens when the attribute is first read.
+        with stage(f"yfinance.{statement}"):
+            return getattr(yf_ticker, attribute)
+
+
+class CachedSource(DataSource):
+    """
+    Serves statements from a StatementCache, asking the wrapped source only
+    when there is no fresh copy (see statement_cache.py).
+    """
+
+    def __init__(self, source, cache=None):
+        self.source = source
+        self.cache = cache or get_default_cache()
+
+    def with_max_age(self, seconds):
+        """
+        The same source over the same cache file, but treating stored
+        statements older than `seconds` as expired (0: always download).
+        A failed or empty download still falls back to the stored copy.
+        """
+        cache = self.cache
+        ttls = {period: seconds for period in cache.ttls}
+        return CachedSource(self.source, StatementCache(
+            cache.path, ttls=ttls, max_bytes=cache.max_bytes,
+            memory_entries=cache.memory_entries, offline=cache.offline,
+        ))
+
+    def get_statement(self, ticker, statement, period="annual"):
+        return self.cache.get(
+            ticker, statement, period,
+            fetch=lambda: self.source.get_statement(ticker, statement, period),
+        )
+
+    def tickers(self):
+        return self.source.tickers()
+
+
+class LocalSource(DataSource):
+    """
+    Reads statements from a snapshot directory laid out as
+
+        <root>/<period>/<statement>/<TICKER>.parquet   (or .csv)
+
+    e.g. snapshot/annual/income_stmt/AAPL.parquet. Each file holds one raw
+    statement with line items as rows and period end dates as columns.
+    Parquet files are memory-mapped; they need the optional 'pyarrow'
+    package, while CSV files work with pandas alone.
+
+    Parameters:
+    - root: The snapshot directory
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, ticker, statement, period, fmt):
+        return os.path.join(self.root, period, statement, f"{ticker.upper().strip()}.{fmt}")
+
+    def get_statement(self, ticker, statement, period="annual"):
+        for fmt in LOCAL_FORMATS:
+            path = self._path(ticker, statement, period, fmt)
+            if not os.path.exists(path):
+                continue
+            with stage(f"local.read_{fmt}"):
+                if fmt == "parquet":
+                    df = pd.read_parquet(path, engine="pyarrow", memory_map=True)
+                else:
+                    df = pd.read_csv(path, index_col=0)
+            # Dates are stored as text; turn them back into timestamps.
+            df.columns = pd.to_datetime(df.columns)
+            return df
+        return pd.DataFrame()
+
+    def tickers(self):
+        folder = os.path.join(self.root, "annual", "income_stmt")
+        if not os.path.isdir(folder):
+            return []
+        return sorted(os.path.splitext(name)[0] for name in os.listdir(folder))
+
+
+# --- 5. Choosing a Source ---
+
+def source_from_spec(spec):
+    """
+    Build a source from a short description: 'yfinance' (cached downloads)
+    or 'local:<directory>' (a snapshot on disk).
+    """
+    if spec in (None, "", "yfinance"):
+        return CachedSource(YFinanceSource())
+    if spec.startswith("local:"):
+        return LocalSource(spec[len("local:"):])
+    raise ValueError(f"Unknown data source {spec!r}. Use 'yfinance' or 'local:<directory>'.")
+
+
+_default_source = None
+_default_source_lock = threading.Lock()
+
+
+def get_default_source():
+    """Return the process-wide source chosen by XRAY_DATA_SOURCE."""
+    global _default_source
+    with _default_source_lock:
+        if _default_source is None:
+            _default_source = source_from_spec(os.environ.get("XRAY_DATA_SOURCE", "yfinance"))
+        return _default_source
+
+
+# --- 6. Recording Snapshots ---
+
+def save_snapshot(tickers, root, source=None, periods=("annual",), fmt="csv"):
+    """
+    Copy statements from a source (default: the default source) into a
+    snapshot directory that LocalSource can read.
+
+    Returns the list of tickers for which at least one statement was saved.
+    """
+    source = source or get_default_source()
+    saved = []
+    for ticker in tickers:
+        ticker = ticker.upper().strip()
+        wrote = False
+        for period in periods:
+            for statement, attribute_period in STATEMENT_ATTRIBUTES:
+                if attribute_period != period:
+                    continue
+                try:
+                    df = source.get_statement(ticker, statement, period)
+                except Exception as e:
+                    # One failed download should not stop the whole snapshot.
+                    print(f"Skipped {ticker} {statement} ({period}): {e}")
+                    continue
+                if df is None or df.empty:
+                    continue
+                out = df.copy()
+                out.columns = [str(c)[:10] for c in out.columns]
+                out.index = out.index.astype(str)
+                out.index.name = "line_item"
+                folder = os.path.join(root, period, statement)
+                os.makedirs(folder, exist_ok=True)
+                path = os.path.join(folder, f"{ticker}.{fmt}")
+                if fmt == "parquet":
+                    out.to_parquet(path)
+                else:
+                    out.to_csv(path)
+                wrote = True
+        if wrote:
+            saved.append(ticker)
+    return saved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage X-Ray data sources.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot", help="Record statements into a local snapshot directory")
+    snapshot.add_argument("root", help="Snapshot directory to write")
+    snapshot.add_argument("tickers", nargs="*", help="Ticker symbols (e.g., AAPL MSFT)")
+    snapshot.add_argument("-f", "--file", help="Text file with tickers (commas, spaces or one per line)")
+    snapshot.add_argument("--format", choices=LOCAL_FORMATS, default="csv")
+    snapshot.add_argument("--quarterly", action="store_true", help="Also record quarterly statements")
+    args = parser.parse_args(argv)
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file) as f:
+            tickers += f.read().replace(",", " ").split()
+    periods = ("annual", "quarterly") if args.quarterly else ("annual",)
+    saved = save_snapshot(tickers, args.root, periods=periods, fmt=args.format)
+    print(f"Saved {len(saved)} of {len(tickers)} tickers to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
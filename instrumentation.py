@@ -0,0 +1,122 @@
+# This module measures where the time goes in an X-Ray run.
+#
+# Each named stage (a statement download, normalizing line items, the ratio
+# engine, drawing an analysis section...) records how many times it ran and
+# how long it took. The totals are kept for the whole process and can be
+# shown in the app's debug panel, printed by the benchmarks, or written to
+# the log as one JSON line per stage call (set XRAY_TIMING_LOG=1).
+#
+#   with stage("normalize"):
+#       normalized = normalize(statements)
+
+# --- 1. Import Necessary Libraries ---
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- 2. Configuration ---
+
+# When set, every stage call is logged as a JSON line on the "xray.timing" logger.
+LOG_STAGES = os.environ.get("XRAY_TIMING_LOG", "").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("xray.timing")
+if LOG_STAGES:
+    # Without a level and handler of its own, INFO records would be dropped
+    # by the root logger's default WARNING level.
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        _handler = logging.StreamHandler()
+        _handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(_handler)
+    logger.propagate = False
+
+# name -> [calls, total seconds, max seconds]
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+# --- 3. Recording ---
+
+def record(name, seconds):
+    """Add one call of `seconds` to the stage called `name`."""
+    with _stats_lock:
+        entry = _stats.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+    if LOG_STAGES:
+        logger.info(json.dumps({"stage": name, "ms": round(seconds * 1000, 3)}))
+
+
+@contextmanager
+def stage(name):
+    """Time the code inside the 'with' block as one call of stage `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator: time every call of the function as stage `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Laps:
+    """
+    Times consecutive sections without indenting them: start("b") ends the
+    running section "a" and starts "b"; stop() ends the running section.
+    """
+
+    def __init__(self):
+        self._name = None
+        self._start = 0.0
+
+    def start(self, name):
+        self.stop()
+        self._name, self._start = name, time.perf_counter()
+
+    def stop(self):
+        if self._name is not None:
+            record(self._name, time.perf_counter() - self._start)
+            self._name = None
+
+
+# --- 4. Reading the Results ---
+
+def snapshot():
+    """
+    Return the recorded stages as a list of dicts (stage, calls, total_ms,
+    mean_ms, max_ms), slowest total first.
+    """
+    with _stats_lock:
+        items = [(name, list(entry)) for name, entry in _stats.items()]
+    rows = [
+        {
+            "stage": name,
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "mean_ms": round(total * 1000 / calls, 3),
+            "max_ms": round(longest * 1000, 3),
+        }
+        for name, (calls, total, longest) in items
+    ]
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def reset():
+    """Forget every recorded stage."""
+    with _stats_lock:
+        _stats.clear()
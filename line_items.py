@@ -0,0 +1,100 @@
+# This module is the single list of line items the X-Ray reads, and the names
+# each one can appear under in Yahoo Finance statements.
+#
+# Financial statements don't always use the exact same name for a line item
+# (e.g., 'Revenue' vs 'Total Revenue'), and Yahoo has renamed some items over
+# the years. Instead of trying every possible name each time a value is read,
+# normalize() resolves the names once when a company's statements are loaded
+# and returns a small frame with one column per canonical field. Everything
+# after that is a plain column read.
+
+# --- 1. Import Necessary Libraries ---
+
+import pandas as pd
+
+from instrumentation import timed
+
+# --- 2. The Line-Item Schema ---
+# Each canonical field lists the statement it comes from and the names to try,
+# in order of preference.
+LINE_ITEMS = {
+    "net_income": ("income_stmt", ['Net Income']),
+    "operating_cash_flow": ("cash_flow", ['Operating Cash Flow', 'Total Cash From Operating Activities']),
+    "current_assets": ("balance_sheet", ['Current Assets', 'Total Current Assets']),
+    "current_liabilities": ("balance_sheet", ['Current Liabilities', 'Total Current Liabilities']),
+    "total_revenue": ("income_stmt", ['Total Revenue', 'Revenue']),
+    "receivables": ("balance_sheet", ['Accounts Receivable', 'Receivables', 'Net Receivables']),
+    "gross_profit": ("income_stmt", ['Gross Profit']),
+    "sga": ("income_stmt", ['Selling General Administrative', 'Selling General And Administration']),
+    "rd": ("income_stmt", ['Research Development', 'Research And Development']),
+    "ebit": ("income_stmt", ['EBIT', 'Operating Income']),
+    "interest_expense": ("income_stmt", ['Interest Expense']),
+    "total_assets": ("balance_sheet", ['Total Assets']),
+}
+
+# Canonical field names, in schema order.
+FIELDS = tuple(LINE_ITEMS)
+
+# Human-friendly names, used in messages.
+FIELD_LABELS = {
+    "net_income": "Net Income",
+    "operating_cash_flow": "Operating Cash Flow",
+    "current_assets": "Current Assets",
+    "current_liabilities": "Current Liabilities",
+    "total_revenue": "Total Revenue",
+    "receivables": "Receivables",
+    "gross_profit": "Gross Profit",
+    "sga": "SG&A",
+    "rd": "R&D",
+    "ebit": "EBIT",
+    "interest_expense": "Interest Expense",
+    "total_assets": "Total Assets",
+}
+
+# The schema compiled into a lookup table: for each statement, a dict of
+# alias -> (canonical field, preference rank). Built once at import time.
+ALIAS_INDEX = {}
+for _field, (_statement, _aliases) in LINE_ITEMS.items():
+    for _rank, _alias in enumerate(_aliases):
+        ALIAS_INDEX.setdefault(_statement, {})[_alias] = (_field, _rank)
+
+
+# --- 3. Normalizing Statements ---
+
+@timed("normalize")
+def normalize(statements):
+    """
+    Resolve a company's statements to the canonical fields.
+
+    Parameters:
+    - statements: Dict with (any of) 'income_stmt', 'balance_sheet' and
+      'cash_flow', each a transposed statement (years as rows)
+
+    Returns a float DataFrame with one row per period and one column per
+    field in FIELDS. When several aliases are present, the first one (in
+    schema order) that has a value wins. Fields that were not found are NaN,
+    and periods with no value for any field are dropped.
+    """
+    parts = []
+    for statement, aliases in ALIAS_INDEX.items():
+        df = statements.get(statement)
+        if df is None or df.empty:
+            continue
+        present = sorted((c for c in df.columns if c in aliases), key=lambda c: aliases[c][1])
+        if not present:
+            continue
+        block = df[present].apply(pd.to_numeric, errors="coerce")
+        block.columns = [aliases[c][0] for c in present]
+        # first() skips NaN, so each field takes its best alias that has a value.
+        parts.append(block.T.groupby(level=0, sort=False).first().T)
+
+    if not parts:
+        return pd.DataFrame(columns=list(FIELDS), dtype="float64")
+    normalized = pd.concat(parts, axis=1).reindex(columns=list(FIELDS)).astype("float64")
+    # Yahoo sometimes adds an old period with no values at all; drop it.
+    return normalized.dropna(how="all")
+
+
+def missing_fields(normalized):
+    """List the canonical fields that have no value in any period."""
+    return [field for field in FIELDS if normalized[field].isna().all()]
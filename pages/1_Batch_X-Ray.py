@@ -0,0 +1,67 @@
+# This page screens a whole watchlist at once.
+# Streamlit shows every file in the 'pages' folder as an extra page in the
+# sidebar, so this runs alongside the single-ticker X-Ray in app.py.
+
+# --- 1. Import Necessary Libraries ---
+
+import streamlit as st
+import pandas as pd
+from batch_xray import COLUMNS, DEFAULT_RATE, DEFAULT_WORKERS, parse_tickers, run_batch
+from xray_analysis import AMBER, ANALYSES, GREEN, RED
+
+# --- 2. Page Configuration ---
+# "wide" gives the results table room for all of its columns.
+st.set_page_config(
+    page_title="Batch X-Ray",
+    page_icon="📊",
+    layout="wide"
+)
+
+# Flags are shown as the same icons used on the single-ticker page.
+FLAG_ICONS = {RED: "🔴", AMBER: "🟡", GREEN: "✅"}
+
+# --- 3. Page UI ---
+
+st.title("Batch X-Ray 📊")
+st.markdown("Paste a list of tickers (or upload a text/CSV file) to screen them all. Results appear as each ticker finishes; click a column header to sort.")
+
+pasted = st.text_area("Tickers (separated by commas, spaces or new lines)", "AAPL, MSFT, GOOGL, AMZN, TSLA")
+uploaded = st.file_uploader("...or upload a file of tickers", type=["txt", "csv"])
+
+# Advanced settings are tucked away in an expander.
+with st.expander("Settings"):
+    workers = st.slider("Tickers processed at the same time", 1, 32, DEFAULT_WORKERS)
+    rate = st.slider("Maximum ticker fetches per second", 0.5, 20.0, DEFAULT_RATE)
+
+if st.button("Run Batch X-Ray"):
+    tickers = parse_tickers(pasted)
+    if uploaded is not None:
+        tickers += parse_tickers(uploaded.getvalue().decode("utf-8", errors="ignore"))
+
+    if not tickers:
+        st.warning("Please enter at least one ticker symbol.")
+    else:
+        # These placeholders are updated in place as results come in.
+        progress = st.progress(0.0, text="Starting...")
+        table = st.empty()
+        rows = []
+        total = len(set(t.upper() for t in tickers))
+
+        for row in run_batch(tickers, workers=workers, rate=rate):
+            # Count red flags so the riskiest companies can be sorted to the top.
+            row["red_flags"] = sum(row.get(f"{name}_flag") == RED for name in ANALYSES)
+            rows.append(row)
+            progress.progress(len(rows) / total, text=f"{len(rows)} of {total} tickers done")
+
+            df = pd.DataFrame(rows).reindex(columns=["red_flags"] + COLUMNS)
+            for name in ANALYSES:
+                df[f"{name}_flag"] = df[f"{name}_flag"].map(FLAG_ICONS).fillna("—")
+            table.dataframe(df.sort_values("red_flags", ascending=False), hide_index=True)
+
+        progress.progress(1.0, text=f"Done: {len(rows)} tickers")
+        csv_data = pd.DataFrame(rows).reindex(columns=["red_flags"] + COLUMNS).to_csv(index=False)
+        st.download_button("Download results (CSV)", csv_data, file_name="xray_batch.csv", mime="text/csv")
+
+# --- 4. Footer ---
+st.markdown("---")
+st.caption("This tool is for educational purposes only, based on financial heuristics from your documents. Data is sourced from Yahoo Finance and is not financial advice.")
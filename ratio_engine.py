@@ -0,0 +1,98 @@
+# This module calculates the seven X-Ray analyses for many companies and
+# many years at once.
+#
+# Instead of pulling single numbers out of each statement and checking each
+# one for None, every canonical line item (see line_items.py) becomes a
+# column of a "panel" (one row per ticker and fiscal year). The ratios and
+# their red / amber / green verdicts are declarative rules (heuristics.json)
+# compiled into one plan of array operations by rule_engine.py.
+# Missing or invalid values are simply NaN: dividing by a masked-out
+# denominator gives NaN, and a NaN ratio gets the "n/a" flag. Screening 5,000
+# tickers costs the same handful of array operations as screening one.
+
+# --- 1. Import Necessary Libraries ---
+
+import pandas as pd
+
+from instrumentation import timed
+from line_items import FIELDS, normalize
+from rule_engine import AMBER, GREEN, NA, RED, get_default_rules
+
+# --- 2. Flags and Analyses ---
+# RED, AMBER, GREEN and NA are defined in rule_engine.py and re-exported here.
+
+# The analyses of the default rule set, in the same order as the app.
+ANALYSES = get_default_rules().analyses
+
+# The ratio columns produced by compute_ratios(), in display order.
+RATIOS = get_default_rules().metrics
+
+
+# --- 3. Building the Panel ---
+
+@timed("build_panel")
+def build_panel(normalized_by_ticker):
+    """
+    Stack the normalized statements of many companies into one panel.
+
+    Parameters:
+    - normalized_by_ticker: Dict of ticker -> frame returned by
+      line_items.normalize() (periods as rows, canonical fields as columns)
+
+    Returns a DataFrame indexed by (ticker, period) with one column per
+    canonical field, i.e. the (ticker, fiscal year, line item) panel with
+    line items unstacked into columns.
+    """
+    frames = {ticker: df for ticker, df in normalized_by_ticker.items() if not df.empty}
+    if not frames:
+        index = pd.MultiIndex.from_arrays([[], []], names=["ticker", "period"])
+        return pd.DataFrame(index=index, columns=list(FIELDS), dtype="float64")
+    return pd.concat(frames, names=["ticker", "period"])
+
+
+# --- 4. The Ratio Engine ---
+
+@timed("compute_ratios")
+def compute_ratios(panel, rules=None):
+    """
+    Run the heuristic rules over every (ticker, period) row of a panel.
+
+    Parameters:
+    - panel: A panel from build_panel() (or CompactStore.panel())
+    - rules: A compiled rule_engine.RuleSet (default: the rule set chosen by
+      XRAY_RULES_PATH, normally heuristics.json)
+
+    Returns a DataFrame with the same index holding the line items (see
+    line_items.FIELDS), the ratios (see RATIOS) and a '<analysis>_flag' column
+    for each analysis (RED, AMBER, GREEN or NA). The previous year for a row
+    is the row before it for the same ticker.
+    """
+    if rules is None:
+        rules = get_default_rules()
+    # Oldest year first, so the previous row of a ticker is its previous year.
+    f = panel.reindex(columns=list(FIELDS)).sort_index()
+    return rules.evaluate(f)
+
+
+def latest(ratios):
+    """
+    Keep only the most recent period of each ticker.
+
+    Returns a DataFrame indexed by ticker, with the period's year added as a
+    'fiscal_year' column.
+    """
+    last = ratios.groupby(level="ticker").tail(1).reset_index(level="period")
+    last.insert(0, "fiscal_year", last.pop("period").map(lambda p: getattr(p, "year", p)))
+    return last
+
+
+def screen(statements_by_ticker):
+    """
+    Normalize each company's statements, build the panel, compute every ratio
+    and return the latest year per ticker.
+
+    Parameters:
+    - statements_by_ticker: Dict of ticker -> dict of transposed statements
+    """
+    normalized = {ticker: normalize(statements) for ticker, statements in statements_by_ticker.items()}
+    return latest(compute_ratios(build_panel(normalized)))
@@ -0,0 +1,251 @@
+# This module re-screens a watchlist, recalculating only the companies whose
+# statements changed since the last run.
+#
+# On most nights only a handful of companies publish new statements. Each
+# ticker's statements get a fingerprint (the latest period of each statement
+# plus a hash of its contents, see statement_fetch.statement_vintage). The
+# fingerprints and verdicts of the last run are kept in a small JSON state
+# file; tickers whose fingerprint is unchanged are skipped, and only the
+# changed ones go through normalize() and the ratio engine, in one panel.
+#
+# The verdicts also depend on the rule file (heuristics.json or
+# XRAY_RULES_PATH), so each ticker's state records the fingerprint of the
+# rules that produced it: after a threshold is edited, every ticker is
+# recalculated and the verdicts it changed are reported.
+#
+# The result lists every verdict that flipped, e.g. the current ratio moving
+# into the "below 1.0" red zone, so a nightly job can report just the news.
+#
+#   python rescreen.py --file sp500.txt --state nightly_state.json --output flips.csv
+#
+# Noticing a new filing means asking Yahoo for every ticker's statements: a
+# cached copy (annual statements stay fresh for a week) would hide it. So by
+# default the statement cache is bypassed, though a failed or empty download
+# still falls back to the cached copy; --max-age allows reusing recent
+# copies. What the nightly run saves is the calculation: only the tickers
+# with new statements are normalized and run through the ratio engine.
+
+# --- 1. Import Necessary Libraries ---
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from compact_store import CompactStore
+from data_sources import CachedSource, get_default_source, source_from_spec
+from line_items import normalize
+from ratio_engine import ANALYSES, NA, compute_ratios, latest
+from rule_engine import get_default_rules
+from statement_fetch import fetch_pool, fetch_statements
+from xray_api import ANALYSIS_DETAILS
+
+# --- 2. Configuration ---
+
+DEFAULT_STATE_PATH = "xray_screen_state.json"
+DEFAULT_WORKERS = 8
+
+# Seconds a cached statement may be reused instead of downloaded again.
+DEFAULT_MAX_AGE = 0
+
+# Column order of the flips CSV.
+FLIP_COLUMNS = ["ticker", "analysis", "fiscal_year", "previous", "current", "value", "message"]
+
+
+# --- 3. Fingerprints and State ---
+
+def fingerprint(fetched):
+    """
+    A short text fingerprint of a ticker's statements: it changes when a new
+    period is reported or any value is restated.
+    """
+    text = "|".join(f"{name}:{period}:{digest}" for name, period, digest in fetched.vintage)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def load_state(path):
+    """Read the state file of the last run (empty if there is none)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path):
+    """Write the state file, replacing the old one only once it is complete."""
+    temp = f"{path}.tmp"
+    with open(temp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(temp, path)
+
+
+def _value(value):
+    # Plain float for JSON, with NaN turned into None.
+    return None if pd.isna(value) else float(value)
+
+
+# --- 4. Re-screening ---
+
+def rescreen(tickers, state, source=None, workers=DEFAULT_WORKERS, max_age=DEFAULT_MAX_AGE):
+    """
+    Re-screen `tickers`, recalculating only those whose statements (or the
+    rules that judged them) changed.
+
+    Parameters:
+    - tickers: Iterable of ticker symbols
+    - state: Dict from load_state() (or {} for a first run); updated in place
+      with the new fingerprints and verdicts
+    - source: DataSource to read from (default: the configured one)
+    - workers: Tickers fetched at the same time
+    - max_age: Seconds a statement in the statement cache may be reused
+      (only for a cached yfinance source; 0 downloads every ticker)
+
+    Returns a dict with:
+    - 'changed': tickers that were recalculated (new, with new statements,
+      or last judged by a different rule file)
+    - 'unchanged': tickers that were skipped
+    - 'failed': ticker -> error, for tickers whose download failed, or that
+      now return no data for a statement they had last time (their state is
+      kept so they are retried next time)
+    - 'flips': one dict per verdict that changed (keys in FLIP_COLUMNS);
+      a ticker seen for the first time has 'previous' set to None
+    """
+    unique = list(dict.fromkeys(t.upper().strip() for t in tickers if t and t.strip()))
+    report = {"changed": [], "unchanged": [], "failed": {}, "flips": []}
+    source = source or get_default_source()
+    if isinstance(source, CachedSource):
+        source = source.with_max_age(max_age)
+    rules = get_default_rules()
+    store = CompactStore(precision="double")
+    prints = {}
+    present = {}
+
+    def check(ticker):
+        fetched = fetch_statements(ticker, source=source, executor=downloads)
+        if fetched.transient_errors():
+            report["failed"][ticker] = "; ".join(f"{k}: {v}" for k, v in fetched.errors.items())
+            return
+        old = state.get(ticker, {})
+        lost = [name for name in old.get("statements", ()) if name not in fetched.statements]
+        if lost or (not fetched.statements and old.get("fiscal_year") is not None):
+            # A company does not lose statements overnight; yfinance returns
+            # empty frames when Yahoo throttles. Keep the old verdicts and
+            # try again next run.
+            missing = ", ".join(lost) or "all statements"
+            report["failed"][ticker] = f"no data returned for {missing} (kept the previous verdicts)"
+            return
+        present[ticker] = sorted(fetched.statements)
+        prints[ticker] = fingerprint(fetched)
+        if old.get("fingerprint") == prints[ticker] and old.get("rules") == rules.fingerprint:
+            report["unchanged"].append(ticker)
+            return
+        # Only changed companies are normalized; their raw statements are
+        # dropped as soon as this function returns.
+        normalized = normalize(fetched.statements)
+        if not normalized.empty:
+            store.add(ticker, normalized)
+        report["changed"].append(ticker)
+
+    downloads = fetch_pool(workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xray-rescreen") as pool:
+            list(pool.map(check, unique))
+    finally:
+        downloads.shutdown(wait=False, cancel_futures=True)
+
+    # Every changed company goes through the ratio engine together.
+    results = latest(compute_ratios(store.panel(), rules)) if len(store) else pd.DataFrame()
+
+    for ticker in sorted(report["changed"]):
+        old = state.get(ticker)
+        entry = {"fingerprint": prints[ticker], "rules": rules.fingerprint, "statements": present[ticker],
+                 "fiscal_year": None, "flags": {}, "values": {}}
+        if ticker in results.index:
+            row = results.loc[ticker]
+            entry["fiscal_year"] = int(row["fiscal_year"])
+            for name in ANALYSES:
+                entry["flags"][name] = row[f"{name}_flag"]
+                entry["values"][name] = _value(row[ANALYSIS_DETAILS[name]["value"]])
+        else:
+            # No canonical line item at all (ETFs, indexes...).
+            entry["flags"] = {name: NA for name in ANALYSES}
+            entry["values"] = {name: None for name in ANALYSES}
+
+        for name in ANALYSES:
+            previous = old["flags"].get(name) if old else None
+            current = entry["flags"][name]
+            if previous != current:
+                report["flips"].append({
+                    "ticker": ticker,
+                    "analysis": name,
+                    "fiscal_year": entry["fiscal_year"],
+                    "previous": previous,
+                    "current": current,
+                    "value": entry["values"][name],
+                    "message": ANALYSIS_DETAILS[name]["messages"].get(current, ""),
+                })
+        state[ticker] = entry
+
+    return report
+
+
+# --- 5. Command Line Interface ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-screen a watchlist, recalculating only tickers with new statements.")
+    parser.add_argument("tickers", nargs="*", help="Ticker symbols (e.g., AAPL MSFT)")
+    parser.add_argument("-f", "--file", help="Text file with tickers (commas, spaces or one per line)")
+    parser.add_argument("-s", "--state", default=DEFAULT_STATE_PATH, help="State file kept between runs")
+    parser.add_argument("-o", "--output", help="CSV file for the verdict flips (default: print to the terminal)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--source", help="'yfinance' or 'local:<snapshot directory>' (default: XRAY_DATA_SOURCE)")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE,
+                        help="Seconds a cached statement may be reused (default 0: download every ticker, "
+                             "falling back to the cache only when a download fails)")
+    parser.add_argument("--first-run-flips", action="store_true",
+                        help="Also list the verdicts of tickers seen for the first time")
+    args = parser.parse_args(argv)
+
+    source = source_from_spec(args.source) if args.source else None
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file) as f:
+            tickers += f.read().replace(",", " ").split()
+    if not tickers and source is not None:
+        tickers = source.tickers() or []
+    if not tickers:
+        parser.error("Give at least one ticker, or --file.")
+
+    state = load_state(args.state)
+    report = rescreen(tickers, state, source=source, workers=args.workers, max_age=args.max_age)
+    save_state(state, args.state)
+
+    flips = report["flips"]
+    if not args.first_run_flips:
+        flips = [flip for flip in flips if flip["previous"] is not None]
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=FLIP_COLUMNS)
+        writer.writeheader()
+        writer.writerows(flips)
+    finally:
+        if args.output:
+            out.close()
+
+    print(
+        f"{len(report['changed'])} changed, {len(report['unchanged'])} unchanged, "
+        f"{len(report['failed'])} failed; {len(flips)} verdict flips",
+        file=sys.stderr,
+    )
+    for ticker, error in report["failed"].items():
+        print(f"  {ticker}: {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
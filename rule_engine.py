@@ -0,0 +1,402 @@
+# This module turns the X-Ray heuristics into data instead of code.
+#
+# Every heuristic is a declarative rule in a JSON file (heuristics.json by
+# default): the line items it reads, the formula of its ratio, named
+# thresholds, the checks that give a red or amber verdict, the document and
+# page it comes from, and the message for each verdict. For example:
+#
+#   "metrics": {"current_ratio": "current_assets / positive(current_liabilities)"},
+#   "rules": [{"id": "liquidity", "value": "current_ratio",
+#              "thresholds": {"min_ratio": 1.0, "max_ratio": 3.0},
+#              "checks": [{"severity": "red", "when": "current_ratio < min_ratio"},
+#                         {"severity": "amber", "when": "current_ratio > max_ratio"}], ...}]
+#
+# When a rule file is loaded, all of its formulas are compiled once into a
+# single evaluation plan: a list of simple array steps in dependency order.
+# A sub-formula used by several rules (e.g. revenue growth, or the previous
+# year's revenue) becomes one step, so it is computed once. Evaluating the
+# plan runs those steps over whole columns of a panel, so every rule is
+# checked for every ticker and year in one pass. Compiled plans are cached,
+# so a custom rule set costs nothing extra per request.
+#
+# Formulas can use:
+#   - the canonical line items (see line_items.FIELDS), the file's
+#     "intermediates" and "metrics", and (in checks) the rule's thresholds
+#   - numbers, + - * / **, comparisons, and / or / not
+#   - positive(x)  x where it is above zero, otherwise NaN
+#   - nonzero(x)   x where it is not zero, otherwise NaN
+#   - abs(x)       absolute value
+#   - prev(x)      x for the same ticker's previous period (NaN for the first)
+#   - growth(x)    (x - prev(x)) / positive(prev(x))
+#   - isna(x), notna(x)
+#   - where(x, condition)  x where the condition holds, otherwise NaN
+# A comparison with a missing value is False.
+#
+# Set XRAY_RULES_PATH to use a different rule file.
+
+# --- 1. Import Necessary Libraries ---
+
+import ast
+import functools
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from line_items import FIELDS
+
+# --- 2. Flags and Configuration ---
+
+RED = "red"        # A heuristic warning from the documents
+AMBER = "amber"    # Worth monitoring
+GREEN = "green"    # The heuristic check passed
+NA = "n/a"         # Could not be calculated (missing data)
+
+# Verdicts a check can give, most severe first.
+SEVERITIES = (RED, AMBER)
+
+# The rule file shipped with the app.
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "heuristics.json")
+
+
+# --- 3. Plan Operations ---
+
+def _float(x):
+    return np.asarray(x, dtype=np.float64)
+
+
+def _prev(x, first):
+    # Shift down one row; the first row of each ticker has no previous period.
+    x = _float(x)
+    if x.ndim == 0:
+        return np.where(first, np.nan, x)
+    out = np.empty_like(x)
+    out[:1] = np.nan
+    out[1:] = x[:-1]
+    out[first] = np.nan
+    return out
+
+
+# Each step of a plan is (slot, operation, argument slots).
+OPERATIONS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "div": np.true_divide,
+    "pow": np.power,
+    "neg": np.negative,
+    "lt": np.less,
+    "le": np.less_equal,
+    "gt": np.greater,
+    "ge": np.greater_equal,
+    "eq": np.equal,
+    "ne": np.not_equal,
+    "and": np.logical_and,
+    "or": np.logical_or,
+    "not": np.logical_not,
+    "positive": lambda x: np.where(_float(x) > 0, x, np.nan),
+    "nonzero": lambda x: np.where(_float(x) != 0, x, np.nan),
+    "abs": np.abs,
+    "isna": lambda x: np.isnan(_float(x)),
+    "notna": lambda x: ~np.isnan(_float(x)),
+    "where": lambda x, condition: np.where(condition, x, np.nan),
+    "prev": None,  # Needs the ticker boundaries; handled in RuleSet.evaluate()
+}
+
+# Functions a formula may call, and how many arguments they take.
+FUNCTIONS = {
+    "positive": 1, "nonzero": 1, "abs": 1, "prev": 1, "growth": 1,
+    "isna": 1, "notna": 1, "where": 2,
+}
+
+_BINARY = {ast.Add: "add", ast.Sub: "sub", ast.Mult: "mul", ast.Div: "div", ast.Pow: "pow",
+           ast.BitAnd: "and", ast.BitOr: "or"}
+_COMPARE = {ast.Lt: "lt", ast.LtE: "le", ast.Gt: "gt", ast.GtE: "ge", ast.Eq: "eq", ast.NotEq: "ne"}
+
+
+# --- 4. Rules ---
+
+class Rule:
+    """
+    One heuristic, as read from the rule file.
+
+    Attributes:
+    - id: Name of the analysis; its verdict column is '<id>_flag'
+    - title: Human-friendly title
+    - inputs: The line items it reads
+    - value: The metric reported as its main number
+    - metrics: The metrics shown with it
+    - thresholds: Dict of threshold name -> number, usable in its checks
+    - checks: List of (severity, formula); the first that holds gives the verdict
+    - not_applicable: Formula that gives the NA verdict (default: the value is missing)
+    - doc_ref: Where the heuristic comes from (document and page)
+    - messages: Dict of verdict -> explanation, with thresholds filled in
+    """
+
+    def __init__(self, spec):
+        for key in ("id", "value"):
+            if key not in spec:
+                raise ValueError(f"rule {spec.get('id', '?')!r}: missing {key!r}.")
+        self.id = spec["id"]
+        self.title = spec.get("title", self.id)
+        self.inputs = tuple(spec.get("inputs", ()))
+        self.value = spec["value"]
+        self.metrics = tuple(spec.get("metrics", (self.value,)))
+        self.thresholds = {name: float(value) for name, value in spec.get("thresholds", {}).items()}
+        self.checks = [(check["severity"], check["when"]) for check in spec.get("checks", ())]
+        self.not_applicable = spec.get("not_applicable") or f"isna({self.value})"
+        self.doc_ref = spec.get("doc_ref", "")
+        self.messages = {}
+        for verdict, text in spec.get("messages", {}).items():
+            try:
+                self.messages[verdict] = text.format(**self.thresholds)
+            except (KeyError, IndexError, ValueError) as e:
+                # e.g. a {placeholder} that is not one of the rule's thresholds
+                raise ValueError(
+                    f"rule {self.id!r}: {verdict!r} message cannot be filled in "
+                    f"({type(e).__name__}: {e}); placeholders must name thresholds."
+                ) from None
+
+    def message(self, verdict):
+        """The explanation for a verdict ('' if the rule file has none)."""
+        return self.messages.get(verdict, "")
+
+
+class RuleSet:
+    """
+    A rule file compiled into one evaluation plan.
+
+    Parameters:
+    - config: The parsed rule file (a dict with 'intermediates', 'metrics'
+      and 'rules')
+    - name: Where the rules came from, used in error messages
+
+    Raises ValueError for unknown names, unsupported syntax, circular
+    definitions, bad severities, message placeholders that are not
+    thresholds, or a rule reporting an intermediate instead of a metric,
+    naming the formula or rule at fault.
+
+    `fingerprint` is a short hash of the whole configuration: it changes
+    whenever a formula, threshold or message does, so stored verdicts can
+    tell which rules produced them.
+    """
+
+    def __init__(self, config, name="<rules>"):
+        self.name = name
+        self.fingerprint = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+        self.description = config.get("description", "")
+        self.intermediates = dict(config.get("intermediates", {}))
+        self.metrics = tuple(config.get("metrics", {}))
+        try:
+            self.rules = tuple(Rule(spec) for spec in config.get("rules", ()))
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}") from None
+        self.analyses = tuple(rule.id for rule in self.rules)
+        self._formulas = {**self.intermediates, **config.get("metrics", {})}
+
+        clashes = set(self._formulas) & set(FIELDS)
+        if clashes:
+            raise ValueError(f"{name}: {sorted(clashes)} are line items and cannot be redefined.")
+        if len(set(self.analyses)) != len(self.analyses):
+            raise ValueError(f"{name}: rule ids must be unique.")
+
+        # The plan: steps in dependency order, plus where each name ends up.
+        self.steps = []
+        self.constants = {}
+        self._slots = {field: field for field in FIELDS}
+        self._memo = {}
+        self._compiling = []
+        for metric in self.metrics:
+            self._definition(metric)
+        for intermediate in self.intermediates:
+            self._definition(intermediate)
+        self._verdicts = {}
+        for rule in self.rules:
+            self._compile_rule(rule)
+
+    def rule(self, rule_id):
+        """Return the rule with this id."""
+        for rule in self.rules:
+            if rule.id == rule_id:
+                return rule
+        raise KeyError(rule_id)
+
+    # --- Compiling ---
+
+    def _compile_rule(self, rule):
+        where = f"{self.name}: rule {rule.id!r}"
+        for field in rule.inputs:
+            if field not in FIELDS:
+                raise ValueError(f"{where}: unknown input {field!r}.")
+        for metric in (rule.value,) + rule.metrics:
+            # Only metrics become result columns; intermediates are dropped
+            # after evaluation, so a rule cannot report one.
+            if metric not in self.metrics:
+                raise ValueError(f"{where}: {metric!r} is not a metric (only metrics appear in the results).")
+        clashes = set(rule.thresholds) & (set(self._formulas) | set(FIELDS))
+        if clashes:
+            raise ValueError(f"{where}: thresholds {sorted(clashes)} shadow other names.")
+        for severity, _ in rule.checks:
+            if severity not in SEVERITIES:
+                raise ValueError(f"{where}: severity must be one of {SEVERITIES}, not {severity!r}.")
+
+        na = self._formula(rule.not_applicable, f"{where} not_applicable", rule.thresholds)
+        checks = [
+            (severity, self._formula(text, f"{where} check {text!r}", rule.thresholds))
+            for severity, text in rule.checks
+        ]
+        self._verdicts[rule.id] = (na, checks)
+
+    def _definition(self, name):
+        # Compile a named intermediate or metric (and, first, what it uses).
+        if name in self._slots:
+            return self._slots[name]
+        if name in self._compiling:
+            cycle = " -> ".join(self._compiling[self._compiling.index(name):] + [name])
+            raise ValueError(f"{self.name}: circular definition {cycle}.")
+        self._compiling.append(name)
+        self._slots[name] = self._formula(self._formulas[name], f"{self.name}: {name!r}")
+        self._compiling.pop()
+        return self._slots[name]
+
+    def _formula(self, text, where, thresholds=None):
+        try:
+            tree = ast.parse(str(text), mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"{where}: cannot parse formula ({e.msg}).") from None
+        return self._node(tree, where, thresholds or {})
+
+    def _emit(self, operation, *args):
+        # Add a step, or reuse an identical earlier one.
+        key = (operation,) + args
+        if key not in self._memo:
+            slot = f"_{len(self.steps)}"
+            self.steps.append((slot, operation, args))
+            self._memo[key] = slot
+        return self._memo[key]
+
+    def _constant(self, value):
+        key = ("const", value)
+        if key not in self._memo:
+            slot = f"_c{len(self.constants)}"
+            self.constants[slot] = value
+            self._memo[key] = slot
+        return self._memo[key]
+
+    def _node(self, node, where, thresholds):
+        compile_ = lambda child: self._node(child, where, thresholds)
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return self._constant(float(node.value))
+        if isinstance(node, ast.Name):
+            if node.id in thresholds:
+                return self._constant(thresholds[node.id])
+            if node.id in FIELDS:
+                return node.id
+            if node.id in self._formulas:
+                return self._definition(node.id)
+            raise ValueError(f"{where}: unknown name {node.id!r}.")
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            return self._emit(_BINARY[type(node.op)], compile_(node.left), compile_(node.right))
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, (ast.Not, ast.Invert)):
+                return self._emit("not", compile_(node.operand))
+            if isinstance(node.op, ast.USub):
+                return self._emit("neg", compile_(node.operand))
+            if isinstance(node.op, ast.UAdd):
+                return compile_(node.operand)
+        if isinstance(node, ast.BoolOp):
+            operation = "and" if isinstance(node.op, ast.And) else "or"
+            slot = compile_(node.values[0])
+            for value in node.values[1:]:
+                slot = self._emit(operation, slot, compile_(value))
+            return slot
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            # a < b < c means a < b and b < c
+            slots = [compile_(node.left)] + [compile_(c) for c in node.comparators]
+            result = None
+            for op, left, right in zip(node.ops, slots, slots[1:]):
+                slot = self._emit(_COMPARE[type(op)], left, right)
+                result = slot if result is None else self._emit("and", result, slot)
+            return result
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            name = node.func.id
+            if node.keywords or len(node.args) != FUNCTIONS[name]:
+                raise ValueError(f"{where}: {name}() takes {FUNCTIONS[name]} argument(s).")
+            args = [compile_(arg) for arg in node.args]
+            if name == "growth":
+                previous = self._emit("prev", args[0])
+                return self._emit("div", self._emit("sub", args[0], previous), self._emit("positive", previous))
+            return self._emit(name, *args)
+        raise ValueError(f"{where}: unsupported expression {ast.unparse(node)!r}.")
+
+    # --- Evaluating ---
+
+    def evaluate(self, panel):
+        """
+        Evaluate every metric and rule over a panel.
+
+        Parameters:
+        - panel: DataFrame indexed by (ticker, period), sorted oldest period
+          first within each ticker, with one column per canonical field
+
+        Returns a DataFrame with the same index holding the line items, one
+        column per metric and a '<rule id>_flag' column per rule (RED, AMBER,
+        GREEN or NA).
+        """
+        n = len(panel)
+        tickers = panel.index.get_level_values("ticker").to_numpy()
+        first = np.ones(n, dtype=bool)
+        first[1:] = tickers[1:] != tickers[:-1]
+
+        values = {field: panel[field].to_numpy(dtype=np.float64) for field in FIELDS}
+        values.update(self.constants)
+        with np.errstate(all="ignore"):
+            for slot, operation, args in self.steps:
+                if operation == "prev":
+                    values[slot] = _prev(values[args[0]], first)
+                else:
+                    values[slot] = OPERATIONS[operation](*(values[arg] for arg in args))
+
+        def column(slot, dtype):
+            return np.broadcast_to(np.asarray(values[slot], dtype=dtype), (n,))
+
+        data = {field: values[field] for field in FIELDS}
+        for metric in self.metrics:
+            data[metric] = column(self._slots[metric], np.float64)
+        for rule in self.rules:
+            na, checks = self._verdicts[rule.id]
+            conditions = [column(na, bool)] + [column(slot, bool) for _, slot in checks]
+            choices = [NA] + [severity for severity, _ in checks]
+            data[f"{rule.id}_flag"] = np.select(conditions, choices, default=GREEN)
+        return pd.DataFrame(data, index=panel.index)
+
+    def explain(self):
+        """The compiled plan as readable text, one step per line."""
+        # A metric that is just a line item (e.g. "t": "total_revenue") must
+        # not rename that line item wherever it is used.
+        names = {slot: name for name, slot in self._slots.items() if slot not in FIELDS}
+        constants = {slot: f"{value:g}" for slot, value in self.constants.items()}
+        label = lambda slot: constants.get(slot) or names.get(slot, slot)
+        lines = [
+            f"{slot} = {operation}({', '.join(label(arg) for arg in args)})"
+            + (f"  # {names[slot]}" if slot in names else "")
+            for slot, operation, args in self.steps
+        ]
+        return "\n".join(lines)
+
+
+# --- 5. Loading Rule Files ---
+
+@functools.lru_cache(maxsize=16)
+def load_rules(path=DEFAULT_RULES_PATH):
+    """Read and compile a rule file (cached, so each file is compiled once)."""
+    with open(path) as f:
+        return RuleSet(json.load(f), name=os.path.basename(path))
+
+
+def get_default_rules():
+    """The rule set chosen by XRAY_RULES_PATH (default: heuristics.json)."""
+    return load_rules(os.environ.get("XRAY_RULES_PATH") or DEFAULT_RULES_PATH)
@@ -0,0 +1,324 @@
+# This module keeps a local copy of every financial statement we download.
+#
+# Annual statements only change a few times a year, but the app used to pull
+# them from Yahoo Finance on every click of "Run X-Ray Analysis". The cache
+# below sits between the app and yfinance (see data_sources.CachedSource) in
+# two tiers:
+#
+#   1. A small in-memory tier (fastest, lives as long as the Python process).
+#   2. A SQLite file on disk (survives restarts, shared by every process).
+#
+# Entries expire after a configurable time-to-live (TTL), the disk file is
+# kept under a size limit by evicting the least recently used entries, and an
+# "offline" mode serves only what is already stored (useful for tests and
+# demos with recorded fixtures and no network).
+#
+# Statements are stored on disk as compressed JSON (line items, period dates
+# and numbers), not as pickled pandas objects, so the cache file can be read
+# by any pandas version. A row that cannot be read (written by an older
+# version of this module, or damaged) is deleted and downloaded again.
+
+# --- 1. Import Necessary Libraries ---
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# --- 2. Configuration ---
+# Every setting can be changed with an environment variable so the app does
+# not need to be edited to tune the cache.
+
+# Where the SQLite file lives.
+CACHE_PATH = os.environ.get(
+    "XRAY_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".xray_cache", "statements.sqlite3"),
+)
+
+# How long (in seconds) a stored statement is considered fresh, per period.
+DEFAULT_TTLS = {
+    "annual": float(os.environ.get("XRAY_CACHE_TTL_ANNUAL", 7 * 24 * 3600)),
+    "quarterly": float(os.environ.get("XRAY_CACHE_TTL_QUARTERLY", 24 * 3600)),
+}
+
+# Upper bound for the disk file, and for the number of in-memory entries.
+MAX_DISK_BYTES = int(os.environ.get("XRAY_CACHE_MAX_MB", 256)) * 1024 * 1024
+MEMORY_ENTRIES = int(os.environ.get("XRAY_CACHE_MEMORY_ENTRIES", 128))
+
+# When offline, nothing is downloaded: only stored statements are served.
+OFFLINE = os.environ.get("XRAY_OFFLINE", "").lower() in ("1", "true", "yes")
+
+class OfflineCacheMiss(LookupError):
+    """Raised in offline mode when a statement has never been stored."""
+
+
+# --- 3. Storage Format ---
+
+def encode_statement(df):
+    """Turn a raw statement into compressed JSON bytes for the disk tier."""
+    dates = isinstance(df.columns, pd.DatetimeIndex)
+    document = {
+        "index": [str(label) for label in df.index],
+        "index_name": df.index.name,
+        "columns": [c.isoformat() if dates else str(c) for c in df.columns],
+        "dates": dates,
+        # NaN is written as the JSON extension NaN, which json.loads reads back.
+        "data": df.to_numpy(dtype="float64", na_value=np.nan).tolist(),
+    }
+    return zlib.compress(json.dumps(document).encode())
+
+
+def decode_statement(payload):
+    """
+    Turn bytes from encode_statement() back into a DataFrame. Raises
+    ValueError for anything else (old pickled rows, damaged rows).
+    """
+    try:
+        document = json.loads(zlib.decompress(payload))
+        columns = document["columns"]
+        index = pd.Index(document["index"], name=document["index_name"])
+        df = pd.DataFrame(document["data"], index=index, columns=columns, dtype="float64")
+    except (zlib.error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"unreadable cache entry ({e})") from None
+    if document["dates"]:
+        df.columns = pd.to_datetime(df.columns)
+    return df
+
+
+# --- 4. The Cache ---
+
+class StatementCache:
+    """
+    Two-tier (memory + SQLite) store of raw yfinance statements.
+
+    Entries are keyed by (ticker, statement, period), e.g.
+    ('AAPL', 'income_stmt', 'annual'). The stored DataFrames are shared with
+    callers, so treat them as read-only (transposing with .T is fine).
+
+    Parameters:
+    - path: Location of the SQLite file (created if it does not exist)
+    - ttls: Dict of period -> seconds an entry stays fresh
+    - max_bytes: Disk size limit; least recently used entries are evicted past it
+    - memory_entries: How many statements the in-memory tier keeps
+    - offline: If True, never call the fetch function
+    """
+
+    def __init__(self, path=CACHE_PATH, ttls=None, max_bytes=MAX_DISK_BYTES,
+                 memory_entries=MEMORY_ENTRIES, offline=OFFLINE):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.offline = offline
+        # OrderedDict doubles as an LRU list: the oldest entry is first.
+        self._memory = OrderedDict()
+        # Memory-tier hits not yet written to the disk's last_access column.
+        self._hits = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS statements (
+                    ticker TEXT NOT NULL,
+                    statement TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (ticker, statement, period)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per operation keeps the cache safe to use
+        # from several threads (and several processes) at once.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _is_fresh(self, fetched_at, period, now):
+        return now - fetched_at < self.ttls.get(period, self.ttls["annual"])
+
+    def _remember(self, key, fetched_at, df):
+        # Add an entry to the in-memory tier, dropping the oldest if it is full.
+        with self._lock:
+            self._memory[key] = (fetched_at, df)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def lookup(self, ticker, statement, period="annual", allow_stale=False):
+        """
+        Return a stored statement, or None if it is missing (or expired and
+        allow_stale is False). Never touches the network.
+        """
+        key = (ticker.upper().strip(), statement, period)
+        now = time.time()
+
+        # Tier 1: memory
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._hits[key] = now
+        if entry is not None and (allow_stale or self._is_fresh(entry[0], period, now)):
+            return entry[1]
+
+        # Tier 2: disk
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fetched_at, payload FROM statements "
+                "WHERE ticker = ? AND statement = ? AND period = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            fetched_at, payload = row
+            if not (allow_stale or self._is_fresh(fetched_at, period, now)):
+                return None
+            try:
+                df = decode_statement(payload)
+            except ValueError:
+                # Treat it as a miss, so the statement is downloaded again
+                # instead of failing on every request.
+                conn.execute(
+                    "DELETE FROM statements WHERE ticker = ? AND statement = ? AND period = ?",
+                    key,
+                )
+                return None
+            conn.execute(
+                "UPDATE statements SET last_access = ? "
+                "WHERE ticker = ? AND statement = ? AND period = ?",
+                (now,) + key,
+            )
+        self._remember(key, fetched_at, df)
+        return df
+
+    def put(self, ticker, statement, period, df):
+        """Store a statement in both tiers, then enforce the disk size limit."""
+        key = (ticker.upper().strip(), statement, period)
+        now = time.time()
+        payload = encode_statement(df)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO statements "
+                "(ticker, statement, period, fetched_at, last_access, size, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (now, now, len(payload), sqlite3.Binary(payload)),
+            )
+            self._flush_hits(conn)
+            self._evict(conn)
+        self._remember(key, now, df)
+
+    def _flush_hits(self, conn):
+        # Write the memory-tier hits to disk before evicting, so statements
+        # served from memory count as recently used there too.
+        with self._lock:
+            hits, self._hits = self._hits, {}
+        conn.executemany(
+            "UPDATE statements SET last_access = MAX(last_access, ?) "
+            "WHERE ticker = ? AND statement = ? AND period = ?",
+            [(when,) + key for key, when in hits.items()],
+        )
+
+    def _evict(self, conn):
+        # Delete least recently used rows until the file is under the limit.
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM statements").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT ticker, statement, period, size FROM statements ORDER BY last_access"
+        ).fetchall()
+        for ticker, statement, period, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute(
+                "DELETE FROM statements WHERE ticker = ? AND statement = ? AND period = ?",
+                (ticker, statement, period),
+            )
+            total -= size
+
+    def get(self, ticker, statement, period, fetch):
+        """
+        Return a statement, downloading it only when no fresh copy is stored.
+
+        Parameters:
+        - ticker: The ticker symbol (case-insensitive)
+        - statement: 'income_stmt', 'balance_sheet' or 'cash_flow'
+        - period: 'annual' or 'quarterly'
+        - fetch: Function with no arguments that downloads the statement
+          (see data_sources.CachedSource)
+        """
+        df = self.lookup(ticker, statement, period)
+        if df is not None:
+            return df
+
+        if self.offline:
+            # Offline mode serves whatever is stored, however old it is.
+            df = self.lookup(ticker, statement, period, allow_stale=True)
+            if df is None:
+                raise OfflineCacheMiss(
+                    f"{statement} ({period}) for {ticker.upper()} is not in the offline cache."
+                )
+            return df
+
+        try:
+            df = fetch()
+        except Exception:
+            # If Yahoo is unavailable, an expired copy is better than nothing.
+            stale = self.lookup(ticker, statement, period, allow_stale=True)
+            if stale is not None:
+                return stale
+            raise
+
+        if df is None or df.empty:
+            # yfinance does not raise when Yahoo throttles or fails; it returns
+            # an empty frame. Never store that over a good copy: serve the
+            # expired copy if there is one, and otherwise return the empty
+            # frame without caching it, so the next request asks again.
+            stale = self.lookup(ticker, statement, period, allow_stale=True)
+            return stale if stale is not None else df
+
+        self.put(ticker, statement, period, df)
+        return df
+
+    def clear(self):
+        """Remove every stored statement from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM statements")
+
+
+# --- 5. Shared Default Cache ---
+# The app and scripts use one cache per process, created on first use.
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Return the process-wide StatementCache, creating it if needed."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = StatementCache()
+        return _default_cache
+
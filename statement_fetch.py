@@ -0,0 +1,227 @@
+# This module downloads the three financial statements for a ticker at the
+# same time instead of one after another, from whichever data source is
+# configured (see data_sources.py).
+#
+# Each statement (income statement, balance sheet, cash flow) is a separate
+# round trip to Yahoo Finance. Running them in a thread pool means the total
+# wait is roughly the slowest of the three rather than their sum. Every leg
+# has its own timeout and error, so one missing statement does not stop the
+# others from being used, and each leg's timing is recorded.
+
+# --- 1. Import Necessary Libraries ---
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FetchTimeout
+
+import pandas as pd
+
+from data_sources import get_default_source
+from instrumentation import record, stage
+
+# --- 2. Configuration ---
+
+# The three statements every X-Ray needs, in display order.
+STATEMENTS = ("income_stmt", "balance_sheet", "cash_flow")
+
+# Human-friendly names, used in messages.
+STATEMENT_LABELS = {
+    "income_stmt": "Income Statement",
+    "balance_sheet": "Balance Sheet",
+    "cash_flow": "Cash Flow Statement",
+}
+
+# The error recorded for a statement Yahoo returned empty. That is normal for
+# ETFs, indexes and cryptocurrencies, but yfinance also returns empty frames
+# when Yahoo throttles, and the two look the same. So an empty statement is
+# never treated as final: it is not cached (statement_cache.py, the app),
+# batch screens try it once more after a pause, and re-screens keep the last
+# verdicts (rescreen.py).
+NO_DATA = "no data returned"
+
+# Seconds each leg may run before giving up on it. The clock starts when the
+# leg starts running, not while it waits for a free thread.
+DEFAULT_TIMEOUT = float(os.environ.get("XRAY_FETCH_TIMEOUT", 15))
+
+# Seconds a leg may wait for a free thread before it is reported as failed.
+QUEUE_TIMEOUT = float(os.environ.get("XRAY_FETCH_QUEUE_TIMEOUT", 120))
+
+# One shared pool for the whole process. Each ticker uses three workers, so
+# this allows a few tickers to be fetched at once without unbounded threads.
+# Code that fetches many tickers at once (batch screens, the JSON service)
+# passes its own pool from fetch_pool() instead.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("XRAY_FETCH_WORKERS", 12)),
+    thread_name_prefix="xray-fetch",
+)
+
+
+def fetch_pool(tickers_at_once):
+    """
+    A thread pool big enough to fetch `tickers_at_once` tickers' three
+    statements at the same time. Pass it to fetch_statements(executor=...).
+    """
+    return ThreadPoolExecutor(
+        max_workers=max(1, tickers_at_once) * len(STATEMENTS),
+        thread_name_prefix="xray-fetch",
+    )
+
+
+# --- 3. Fetch Result ---
+
+class FetchResult:
+    """
+    The outcome of fetching all three statements for one ticker.
+
+    Attributes:
+    - ticker: The upper-cased ticker symbol
+    - statements: Dict of statement name -> transposed DataFrame (years as rows),
+      only for the statements that were retrieved and are not empty
+    - errors: Dict of statement name -> reason it is missing
+    - timings: Dict of statement name -> seconds the leg took
+    - vintage: Fingerprint of the retrieved statements (see statement_vintage),
+      calculated the first time it is read
+    """
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self.statements = {}
+        self.errors = {}
+        self.timings = {}
+        self._vintage = None
+
+    @property
+    def vintage(self):
+        # Hashing every statement costs about as much as normalizing it, and
+        # only the app's cache keys and the re-screen need it, so it is only
+        # calculated on request.
+        if self._vintage is None:
+            with stage("fetch.vintage"):
+                self._vintage = statement_vintage(self.statements)
+        return self._vintage
+
+    def has(self, *names):
+        """True if every named statement was retrieved."""
+        return all(name in self.statements for name in names)
+
+    def missing(self, *names):
+        """The subset of the named statements that were not retrieved."""
+        return [name for name in names if name not in self.statements]
+
+    def transient_errors(self):
+        """Errors worth retrying (timeouts, network problems), not empty statements."""
+        return {name: reason for name, reason in self.errors.items() if reason != NO_DATA}
+
+    def empty_statements(self):
+        """The statements Yahoo returned empty (see NO_DATA)."""
+        return [name for name, reason in self.errors.items() if reason == NO_DATA]
+
+
+# --- 4. Statement Vintage ---
+
+def statement_vintage(statements):
+    """
+    A short, hashable fingerprint of a set of transposed statements.
+
+    For each statement it records the most recent period and a hash of the
+    contents, so it changes whenever a new year is reported or a value is
+    restated. Useful as a cache key.
+    """
+    parts = []
+    for name in STATEMENTS:
+        df = statements.get(name)
+        if df is None:
+            parts.append((name, None, None))
+            continue
+        digest = hashlib.sha1("|".join(map(str, df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        parts.append((name, str(df.index.max())[:10], digest.hexdigest()[:16]))
+    return tuple(parts)
+
+
+# --- 5. Fetching ---
+
+def _fetch_leg(source, ticker, statement, period, started):
+    # Runs in a worker thread. Errors are returned rather than raised so the
+    # timing is still recorded for failed legs. `started` tells the caller
+    # when the leg left the queue, which is when its timeout begins.
+    started.at = time.monotonic()
+    started.set()
+    start = time.perf_counter()
+    try:
+        df = source.get_statement(ticker, statement, period)
+        error = None
+    except Exception as e:
+        df, error = None, e
+    elapsed = time.perf_counter() - start
+    record(f"fetch.{statement}", elapsed)
+    return df, error, elapsed
+
+
+def fetch_statements(ticker, period="annual", timeout=DEFAULT_TIMEOUT, source=None, executor=None):
+    """
+    Fetch the income statement, balance sheet and cash flow concurrently.
+
+    Parameters:
+    - ticker: The ticker symbol (e.g., 'AAPL')
+    - period: 'annual' or 'quarterly'
+    - timeout: Seconds each leg may run, counted from when it starts
+      (time spent waiting for a free thread does not count)
+    - source: The DataSource to read from (defaults to the one chosen by
+      XRAY_DATA_SOURCE: cached yfinance downloads or a local snapshot)
+    - executor: Thread pool for the legs (default: the shared pool; see
+      fetch_pool() for callers that fetch many tickers at once)
+
+    Returns a FetchResult. It never raises for a single failed statement;
+    check result.errors to see which ones are missing and why.
+    """
+    source = source or get_default_source()
+    result = FetchResult(ticker.upper().strip())
+
+    executor = executor or _executor
+    started = {name: threading.Event() for name in STATEMENTS}
+    futures = {
+        name: executor.submit(_fetch_leg, source, result.ticker, name, period, started[name])
+        for name in STATEMENTS
+    }
+    for name, future in futures.items():
+        # A leg cancelled while queued (its pool was shut down) never starts;
+        # wake the wait below instead of letting it run to QUEUE_TIMEOUT.
+        future.add_done_callback(lambda _, event=started[name]: event.set())
+
+    for name, future in futures.items():
+        if not started[name].wait(QUEUE_TIMEOUT):
+            future.cancel()
+            result.errors[name] = f"still waiting for a free thread after {QUEUE_TIMEOUT:.0f}s"
+            result.timings[name] = 0.0
+            continue
+        if future.cancelled():
+            result.errors[name] = "cancelled"
+            result.timings[name] = 0.0
+            continue
+        deadline = started[name].at + timeout
+        try:
+            df, error, elapsed = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FetchTimeout:
+            # The worker keeps running in the background; with the cached
+            # yfinance source its statement still lands in the cache for the
+            # next request.
+            result.errors[name] = f"timed out after {timeout:.0f}s"
+            result.timings[name] = timeout
+            continue
+
+        result.timings[name] = elapsed
+        if error is not None:
+            result.errors[name] = str(error)
+        elif df is None or df.empty:
+            # ETFs, indexes and cryptocurrencies, or Yahoo throttling.
+            result.errors[name] = NO_DATA
+        else:
+            # .T transposes the data, making years the rows.
+            with stage("fetch.transpose"):
+                result.statements[name] = df.T
+
+    return result
@@ -0,0 +1,177 @@
+# Regression tests for the rule engine (run with: python -m pytest).
+#
+# The seven heuristics used to be written out by hand in ratio_engine.py.
+# reference_ratios() below is that hand-written engine, kept here so any
+# change to heuristics.json or rule_engine.py that alters a ratio or a
+# verdict is caught. The comparison runs on a random panel full of zeros,
+# negative values and gaps, where the edge cases live.
+
+# --- 1. Import Necessary Libraries ---
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from line_items import FIELDS
+from ratio_engine import AMBER, ANALYSES, GREEN, NA, RATIOS, RED, compute_ratios
+from rule_engine import RuleSet, get_default_rules
+
+# --- 2. The Hand-Written Engine ---
+
+def _positive(series):
+    return series.where(series > 0)
+
+
+def _growth(current, previous):
+    return (current - previous) / _positive(previous)
+
+
+def _flags(value, red=None, amber=None):
+    conditions, choices = [value.isna()], [NA]
+    if red is not None:
+        conditions.append(red)
+        choices.append(RED)
+    if amber is not None:
+        conditions.append(amber)
+        choices.append(AMBER)
+    return pd.Series(np.select(conditions, choices, default=GREEN), index=value.index)
+
+
+def reference_ratios(panel):
+    """The seven analyses as ratio_engine.compute_ratios() wrote them by hand."""
+    f = panel.reindex(columns=list(FIELDS)).sort_index()
+    prev = f.groupby(level="ticker").shift(1)
+    revenue = _positive(f["total_revenue"])
+    out = f.copy()
+
+    out["cash_conversion"] = f["operating_cash_flow"] / _positive(f["net_income"])
+    out["cash_conversion_flag"] = _flags(out["cash_conversion"], red=out["cash_conversion"] < 0.8)
+
+    out["current_ratio"] = f["current_assets"] / _positive(f["current_liabilities"])
+    out["liquidity_flag"] = _flags(
+        out["current_ratio"], red=out["current_ratio"] < 1.0, amber=out["current_ratio"] > 3.0
+    )
+
+    out["revenue_growth"] = _growth(f["total_revenue"], prev["total_revenue"])
+    out["receivables_growth"] = _growth(f["receivables"], prev["receivables"])
+    both = out["revenue_growth"].notna() & out["receivables_growth"].notna()
+    out["revenue_quality_flag"] = _flags(
+        out["receivables_growth"].where(both),
+        red=out["receivables_growth"] > out["revenue_growth"],
+    )
+
+    out["gross_margin"] = f["gross_profit"] / revenue
+    out["gross_margin_prev"] = (prev["gross_profit"] / _positive(prev["total_revenue"])).where(revenue.notna())
+    out["gross_margin_flag"] = _flags(
+        out["gross_margin"].where(out["gross_margin_prev"].notna()),
+        amber=~(out["gross_margin"] > out["gross_margin_prev"]),
+    )
+
+    out["sga_ratio"] = f["sga"] / revenue
+    out["rd_ratio"] = f["rd"] / revenue
+    out["sga_growth"] = _growth(f["sga"], prev["sga"]).where(revenue.notna())
+    leverage = out["sga_growth"].notna() & out["revenue_growth"].notna()
+    amber = (out["sga_ratio"] > 0.5) | (leverage & ~(out["revenue_growth"] > out["sga_growth"]))
+    computed = out["sga_ratio"].notna() | leverage
+    out["operating_expenses_flag"] = np.select([amber, computed], [AMBER, GREEN], default=NA)
+
+    out["ebit_margin"] = f["ebit"] / revenue
+    interest = f["interest_expense"].abs()
+    out["interest_coverage"] = f["ebit"] / interest.where(interest != 0)
+    out["debt_coverage_flag"] = _flags(out["interest_coverage"], red=out["interest_coverage"] < 2.0)
+
+    out["accrual_ratio"] = (f["net_income"] - f["operating_cash_flow"]) / _positive(f["total_assets"])
+    out["accruals_flag"] = _flags(out["accrual_ratio"], red=out["accrual_ratio"] > 0.05)
+
+    return out
+
+
+# --- 3. Test Data ---
+
+def random_panel(tickers=300, years=6, seed=42):
+    """
+    A (ticker, period) panel of random line items: about 15% negative,
+    5% zero and 10% missing values, so every n/a branch is exercised.
+    """
+    rng = np.random.default_rng(seed)
+    rows = tickers * years
+    values = rng.lognormal(mean=8, sigma=1.5, size=(rows, len(FIELDS)))
+    values[rng.random(values.shape) < 0.15] *= -1
+    values[rng.random(values.shape) < 0.05] = 0.0
+    values[rng.random(values.shape) < 0.10] = np.nan
+    index = pd.MultiIndex.from_product(
+        [[f"T{i:03d}" for i in range(tickers)], pd.date_range("2019-12-31", periods=years, freq="YE")],
+        names=["ticker", "period"],
+    )
+    return pd.DataFrame(values, index=index, columns=list(FIELDS))
+
+
+# --- 4. Tests ---
+
+def test_default_rules_match_hand_written_engine():
+    panel = random_panel()
+    assert len(panel) == 1800
+    expected = reference_ratios(panel)
+    result = compute_ratios(panel, rules=get_default_rules())
+
+    for name in RATIOS:
+        pd.testing.assert_series_equal(result[name], expected[name], check_exact=True, check_names=False)
+    for name in ANALYSES:
+        flags = result[f"{name}_flag"].to_numpy(dtype=object)
+        assert (flags == expected[f"{name}_flag"].to_numpy(dtype=object)).all(), name
+
+    # The panel really does reach every verdict.
+    verdicts = set(np.concatenate([result[f"{name}_flag"].to_numpy(dtype=object) for name in ANALYSES]))
+    assert verdicts == {RED, AMBER, GREEN, NA}
+
+
+def test_custom_rule_file():
+    rules = RuleSet({
+        "metrics": {"net_margin": "net_income / positive(total_revenue)"},
+        "rules": [{
+            "id": "net_margin",
+            "value": "net_margin",
+            "thresholds": {"min_margin": 0.1},
+            "checks": [{"severity": "red", "when": "net_margin < min_margin"}],
+            "messages": {"red": "Net margin is below {min_margin:.0%}."},
+        }],
+    }, name="custom")
+    panel = random_panel(tickers=20, years=2, seed=7)
+    result = compute_ratios(panel, rules=rules)
+
+    margin = panel["net_income"] / panel["total_revenue"].where(panel["total_revenue"] > 0)
+    expected = np.select([margin.isna(), margin < 0.1], [NA, RED], default=GREEN)
+    assert (result["net_margin_flag"].to_numpy(dtype=object) == expected).all()
+    assert rules.rule("net_margin").message(RED) == "Net margin is below 10%."
+
+
+@pytest.mark.parametrize("metrics, rule", [
+    ({"m": "unknown_item / total_revenue"}, {}),                            # Unknown name
+    ({"m": "total_revenue.__class__"}, {}),                                 # Unsupported syntax
+    ({"m": "sum(total_revenue)"}, {}),                                      # Unknown function
+    ({"m": "n", "n": "m"}, {}),                                             # Circular definition
+    ({"total_revenue": "ebit"}, {}),                                        # Redefines a line item
+    ({"m": "ebit"}, {"checks": [{"severity": "purple", "when": "m > 0"}]}),  # Bad severity
+    ({"m": "ebit"}, {"inputs": ["turnover"]}),                              # Unknown input
+    ({"m": "ebit"}, {"messages": {"red": "Below {limit}."}}),               # Not a threshold
+    ({"m": "ebit"}, {"metrics": ["margin"]}),                               # Not a metric
+])
+def test_bad_rule_files_are_rejected(metrics, rule):
+    config = {"metrics": metrics, "rules": [{"id": "test", "value": next(iter(metrics)), **rule}]}
+    with pytest.raises(ValueError):
+        RuleSet(config)
+
+
+def test_rules_cannot_report_intermediates():
+    config = {
+        "intermediates": {"rev": "positive(total_revenue)"},
+        "metrics": {"margin": "ebit / rev"},
+        "rules": [{"id": "test", "value": "rev"}],
+    }
+    with pytest.raises(ValueError, match="'rev' is not a metric"):
+        RuleSet(config)
+
+
+def test_explain_keeps_line_item_names():
+    rules = RuleSet({"metrics": {"t": "total_revenue", "big": "t > 2"}, "rules": []})
+    assert "gt(total_revenue, 2)" in rules.explain()
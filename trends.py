@@ -0,0 +1,229 @@
+# This module looks at every year (or quarter) Yahoo Finance returns, not just
+# the latest two.
+#
+# The ratio engine already calculates the ratios for every period of the
+# panel. On top of those, this module adds:
+#   - period-over-period changes of each ratio ("rolling deltas"),
+#   - streaks: how many periods in a row a warning sign has been present
+#     (e.g., receivables outgrowing revenue 3 years running),
+#   - compound annual growth rates (CAGR) over the whole history.
+#
+# When a company reports a new year, extend_trends() only calculates the new
+# rows, continuing the existing deltas and streaks instead of starting over.
+# A company with a single year of data still gets a one-row snapshot; its
+# trend columns are simply NaN / zero.
+
+# --- 1. Import Necessary Libraries ---
+
+import pandas as pd
+
+from instrumentation import timed
+from ratio_engine import AMBER, GREEN, RED, compute_ratios
+from rule_engine import get_default_rules
+
+# --- 2. Configuration ---
+
+# Ratios whose change from the previous period is tracked.
+DELTA_RATIOS = (
+    "cash_conversion", "current_ratio", "gross_margin", "sga_ratio", "rd_ratio",
+    "ebit_margin", "interest_coverage", "accrual_ratio",
+)
+
+# Warning signs that are counted in streaks: (name, rule id, verdict, label).
+# A period counts when the rule's '<rule id>_flag' column has that verdict,
+# so a streak means exactly the same thing as the single-year verdict. The
+# labels may use the rule's thresholds, e.g. {min_ratio}.
+_SIGNS = (
+    ("receivables_outgrowing_revenue", "revenue_quality", RED, "Receivables have grown faster than revenue"),
+    ("low_cash_conversion", "cash_conversion", RED, "Cash conversion has been below {min_ratio}"),
+    ("current_ratio_below_one", "liquidity", RED, "The current ratio has been below {min_ratio}"),
+    ("falling_gross_margin", "gross_margin", AMBER, "Gross margin has been stable or falling"),
+    ("high_operating_expenses", "operating_expenses", AMBER,
+     "SG&A has been above {max_sga_ratio:.0%} of revenue or grown faster than revenue"),
+    ("weak_interest_coverage", "debt_coverage", RED, "Interest coverage has been below {min_coverage:g}x"),
+    ("high_accruals", "accruals", RED, "The accrual ratio has been above {max_ratio:.0%}"),
+)
+
+
+def _label(text, rule, verdict):
+    # Fill in the thresholds; a custom rule file may name them differently.
+    try:
+        return text.format(**rule.thresholds)
+    except (KeyError, ValueError):
+        return f"{rule.title} has been {verdict}"
+
+
+_rules = get_default_rules()
+
+# Streak name -> (rule id, verdict), for the rules of the default rule set
+# (see heuristics.json). Signs whose rule is not in the set are left out.
+STREAKS = {
+    name: (rule_id, verdict)
+    for name, rule_id, verdict, _ in _SIGNS
+    if rule_id in _rules.analyses
+}
+
+# Human-friendly descriptions of the warning signs, used in messages.
+STREAK_LABELS = {
+    name: _label(text, _rules.rule(rule_id), verdict)
+    for name, rule_id, verdict, text in _SIGNS
+    if rule_id in _rules.analyses
+}
+
+# Line items reported with a compound annual growth rate.
+CAGR_FIELDS = ("total_revenue", "net_income", "operating_cash_flow", "receivables", "total_assets")
+
+# A warning sign present this many periods in a row gets a red streak flag.
+DEFAULT_STREAK_LENGTH = 3
+
+
+# --- 3. Helper Functions ---
+
+def _streak(condition, seed=None):
+    # Count how many periods in a row `condition` has been True, per ticker.
+    # `seed` (indexed by ticker) is the streak already running before the
+    # first row of each ticker, used when extending existing trends.
+    tickers = condition.index.get_level_values("ticker")
+    # Each False starts a new run; the run number increases at every False.
+    runs = (~condition).groupby(tickers).cumsum()
+    streak = condition.astype("int64").groupby([tickers, runs.values]).cumsum()
+    if seed is not None:
+        # Rows in the first run continue the streak that was already running.
+        carried = pd.Series(tickers.map(seed), index=condition.index).fillna(0).astype("int64")
+        streak = streak + carried.where((runs == 0).values, 0)
+    return streak
+
+
+def _add_trends(ratios, previous=None):
+    # Add delta and streak columns to a ratio frame (sorted oldest first).
+    # `previous` holds the last already-computed row per ticker, if any.
+    out = ratios.copy()
+    tickers = out.index.get_level_values("ticker")
+
+    for name in DELTA_RATIOS:
+        prior = out[name].groupby(tickers).shift(1)
+        if previous is not None:
+            # The first new row of a ticker compares against its stored row.
+            first = prior.isna() & ~tickers.duplicated()
+            stored = pd.Series(tickers.map(previous[name]), index=prior.index)
+            prior = prior.where(~first, stored)
+        out[f"{name}_change"] = out[name] - prior
+
+    for name, (rule_id, verdict) in STREAKS.items():
+        seed = previous[f"{name}_streak"] if previous is not None else None
+        out[f"{name}_streak"] = _streak(out[f"{rule_id}_flag"] == verdict, seed)
+
+    return out
+
+
+# --- 4. Computing and Extending Trends ---
+
+@timed("compute_trends")
+def compute_trends(panel):
+    """
+    Calculate every ratio, delta and streak for every period of a panel.
+
+    Parameters:
+    - panel: A panel from ratio_engine.build_panel() (annual or quarterly)
+
+    Returns the compute_ratios() frame plus a '<ratio>_change' column for
+    each ratio in DELTA_RATIOS and a '<sign>_streak' column for each warning
+    sign in STREAKS.
+    """
+    return _add_trends(compute_ratios(panel))
+
+
+@timed("extend_trends")
+def extend_trends(trends, panel):
+    """
+    Add newly reported periods to an existing trends frame.
+
+    Only the periods of `panel` that are not in `trends` are calculated,
+    each using the company's previous stored period for growth rates, deltas
+    and streaks. New periods are expected to be newer than the stored ones;
+    for back-filled history, call compute_trends() on the full panel instead.
+    """
+    new_index = panel.index.difference(trends.index)
+    if len(new_index) == 0:
+        return trends
+
+    tickers = new_index.unique(level="ticker")
+    stored = trends[trends.index.get_level_values("ticker").isin(tickers)]
+    previous = stored.groupby(level="ticker").tail(1)
+
+    # Growth rates need the line items of the previous period, so the stored
+    # row is included in the calculation and dropped again afterwards.
+    subset = panel[panel.index.isin(previous.index.union(new_index))]
+    ratios = compute_ratios(subset)
+    ratios = ratios[ratios.index.isin(new_index)]
+    fresh = _add_trends(ratios, previous.reset_index(level="period"))
+
+    return pd.concat([trends, fresh]).sort_index()
+
+
+def update_trends(trends, old_panel, panel):
+    """
+    Bring a stored trends frame up to date with a newer panel of the same
+    tickers.
+
+    When the new panel only adds periods after the stored ones and every
+    stored period is unchanged, only the new periods are calculated (see
+    extend_trends()). Anything else (restated values, back-filled history,
+    removed periods) is recalculated from scratch.
+
+    Parameters:
+    - trends: The frame returned for old_panel by compute_trends() (or by an
+      earlier update_trends())
+    - old_panel: The panel `trends` was calculated from
+    - panel: The new panel
+    """
+    old_index = old_panel.index
+    if not old_index.isin(panel.index).all():
+        return compute_trends(panel)
+    new_index = panel.index.difference(old_index)
+    if len(new_index) and len(old_index):
+        newest = old_panel.reset_index(level="period").groupby(level="ticker")["period"].max()
+        added = new_index.to_frame(index=False)
+        if (added["period"] <= added["ticker"].map(newest)).any():
+            return compute_trends(panel)
+    if not panel.loc[old_index].equals(old_panel):
+        return compute_trends(panel)
+    return extend_trends(trends, panel)
+
+
+# --- 5. Summaries ---
+
+def cagr(trends, fields=CAGR_FIELDS):
+    """
+    Compound annual growth rate of each field per ticker, from the first to
+    the last period where the field is positive. NaN when fewer than two
+    such periods exist.
+    """
+    result = {}
+    for field in fields:
+        valid = trends[field].where(trends[field] > 0).dropna()
+        groups = valid.groupby(level="ticker")
+        first, last = groups.head(1), groups.tail(1)
+        start = first.droplevel("period")
+        end = last.droplevel("period")
+        start_period = first.index.get_level_values("period")
+        end_period = last.index.get_level_values("period")
+        years = pd.Series((end_period - start_period).days / 365.25, index=end.index)
+        # Mask the result, not just the exponent: 1.0 ** NaN is 1.0, which
+        # would turn a single positive period into a 0% CAGR.
+        result[f"{field}_cagr"] = ((end / start) ** (1 / years.where(years > 0)) - 1).where(years > 0)
+    return pd.DataFrame(result).reindex(trends.index.unique(level="ticker"))
+
+
+def summarize(trends, streak_length=DEFAULT_STREAK_LENGTH):
+    """
+    One row per ticker: the latest period's ratios, deltas and streaks, the
+    CAGRs, the number of periods available and a '<sign>_streak_flag' that is
+    RED when a warning sign has lasted at least `streak_length` periods
+    (GREEN otherwise).
+    """
+    last = trends.groupby(level="ticker").tail(1).reset_index(level="period")
+    last["periods"] = trends.groupby(level="ticker").size()
+    for name in STREAKS:
+        last[f"{name}_streak_flag"] = last[f"{name}_streak"].ge(streak_length).map({True: RED, False: GREEN})
+    return last.join(cagr(trends))
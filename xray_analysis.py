@@ -0,0 +1,54 @@
+# This module runs the seven X-Ray analyses for one company without any user
+# interface.
+#
+# The calculations themselves live in ratio_engine.py, which works on many
+# companies and years at once. analyze() is the single-company shortcut: it
+# returns the numbers and a red / amber / green flag per analysis as one flat
+# dict, which is easy to put into a table or a CSV file.
+
+# --- 1. Import Necessary Libraries ---
+
+import pandas as pd
+
+from line_items import missing_fields, normalize
+from ratio_engine import AMBER, ANALYSES, GREEN, NA, RATIOS, RED, build_panel, compute_ratios, latest
+
+__all__ = ["AMBER", "ANALYSES", "GREEN", "NA", "RATIOS", "RED", "analyze", "analyze_frame"]
+
+
+# --- 2. The Analyses ---
+
+def analyze_frame(normalized, ticker="-"):
+    """
+    Run all seven analyses for one company and return the full engine output
+    for its most recent year as a pandas Series (line items, ratios and flags,
+    with NaN for anything that could not be calculated).
+
+    Parameters:
+    - normalized: The company's statements after line_items.normalize()
+    - ticker: Label used in the panel index
+    """
+    return latest(compute_ratios(build_panel({ticker: normalized}))).iloc[0]
+
+
+def analyze(statements):
+    """
+    Run all seven analyses for one company.
+
+    Parameters:
+    - statements: Dict with (any of) 'income_stmt', 'balance_sheet' and
+      'cash_flow', each a transposed statement (years as rows, newest first)
+
+    Returns a flat dict with the fiscal year, each ratio (None when it could
+    not be calculated), a '<analysis>_flag' entry for each of the seven
+    analyses (RED, AMBER, GREEN or NA) and the line items that were missing.
+    """
+    normalized = normalize(statements)
+    row = analyze_frame(normalized)
+    result = {"fiscal_year": None if pd.isna(row["fiscal_year"]) else int(row["fiscal_year"])}
+    for name in RATIOS:
+        result[name] = None if pd.isna(row[name]) else float(row[name])
+    for name in ANALYSES:
+        result[f"{name}_flag"] = row[f"{name}_flag"]
+    result["missing_fields"] = ", ".join(missing_fields(normalized))
+    return result
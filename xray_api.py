@@ -0,0 +1,106 @@
+# This module is the X-Ray as a plain Python library.
+#
+# It returns structured results instead of drawing a web page, so other
+# programs (scripts, notebooks, the HTTP service in xray_service.py) can use
+# the same analyses as the Streamlit app:
+#
+#   from xray_api import xray
+#   report = xray("AAPL")
+#   for analysis in report["analyses"]:
+#       print(analysis["title"], analysis["value"], analysis["verdict"])
+#
+# Every analysis reports its main value, the other metrics and the input
+# line items it used, the heuristic verdict (red / amber / green / n/a), a
+# message explaining the verdict and the document reference it comes from.
+
+# --- 1. Import Necessary Libraries ---
+
+import math
+
+from instrumentation import timed
+from line_items import missing_fields, normalize
+from rule_engine import get_default_rules
+from statement_fetch import fetch_statements
+from xray_analysis import analyze_frame
+
+# --- 2. Analysis Details ---
+# What each analysis reports, and what each verdict means. These come from
+# the rule file (see rule_engine.py and heuristics.json).
+ANALYSIS_DETAILS = {
+    rule.id: {
+        "title": rule.title,
+        "value": rule.value,
+        "metrics": rule.metrics,
+        "inputs": rule.inputs,
+        "doc_ref": rule.doc_ref,
+        "messages": rule.messages,
+    }
+    for rule in get_default_rules().rules
+}
+
+
+# --- 3. Helper Functions ---
+
+def _number(value):
+    # Plain float for JSON, with NaN turned into None.
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+# --- 4. The Library ---
+
+@timed("build_report")
+def build_report(ticker, fetched):
+    """
+    Turn fetched statements into a structured X-Ray report.
+
+    Parameters:
+    - ticker: The ticker symbol
+    - fetched: A FetchResult (or anything with .statements and .errors)
+
+    Returns a dict with 'ticker', 'fiscal_year', 'errors', 'missing_fields'
+    and 'analyses' (one dict per analysis with 'id', 'title', 'value',
+    'metrics', 'inputs', 'verdict', 'message' and 'doc_ref').
+    """
+    report = {
+        "ticker": ticker.upper().strip(),
+        "fiscal_year": None,
+        "errors": dict(fetched.errors),
+        "missing_fields": [],
+        "analyses": [],
+    }
+    normalized = normalize(fetched.statements)
+    if normalized.empty:
+        return report
+
+    row = analyze_frame(normalized, report["ticker"])
+    report["fiscal_year"] = int(row["fiscal_year"])
+    report["missing_fields"] = missing_fields(normalized)
+
+    for name, details in ANALYSIS_DETAILS.items():
+        verdict = row[f"{name}_flag"]
+        report["analyses"].append({
+            "id": name,
+            "title": details["title"],
+            "value": _number(row[details["value"]]),
+            "metrics": {metric: _number(row[metric]) for metric in details["metrics"]},
+            "inputs": {field: _number(row[field]) for field in details["inputs"]},
+            "verdict": verdict,
+            "message": details["messages"].get(verdict, ""),
+            "doc_ref": details["doc_ref"],
+        })
+    return report
+
+
+def xray(ticker, fetch=fetch_statements):
+    """
+    Fetch a ticker's statements and return its structured X-Ray report.
+
+    Parameters:
+    - ticker: The ticker symbol (e.g., 'AAPL')
+    - fetch: Function of a ticker that returns a FetchResult. Defaults to
+      fetch_statements(); pass a stub to run without the network.
+    """
+    return build_report(ticker, fetch(ticker))
@@ -0,0 +1,122 @@
+# This module serves the X-Ray over HTTP as JSON, without Streamlit.
+#
+# Streamlit re-runs the whole app script for every browser interaction, which
+# is fine for people but wasteful for other programs. This small service
+# keeps one long-running process with warm caches and a shared Yahoo session,
+# and answers each request on its own thread.
+#
+# Run it with:
+#   python xray_service.py --port 8000
+#
+# Endpoints:
+#   GET /health                      -> {"status": "ok"}
+#   GET /xray/AAPL                   -> the X-Ray report for one ticker
+#   GET /xray?tickers=AAPL,MSFT      -> {"results": [report, report, ...]}
+
+# --- 1. Import Necessary Libraries ---
+
+import argparse
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from data_sources import source_from_spec
+from statement_fetch import fetch_pool, fetch_statements
+from xray_api import xray
+
+# --- 2. Configuration ---
+
+# Ticker symbols: letters, digits and the few symbols Yahoo uses (BRK-B, ^GSPC, EURUSD=X).
+TICKER_PATTERN = re.compile(r"^[A-Za-z0-9.\-^=]{1,15}$")
+
+# Most tickers accepted in one /xray?tickers=... request.
+MAX_TICKERS_PER_REQUEST = 50
+
+
+# --- 3. Request Handler ---
+
+class XRayHandler(BaseHTTPRequestHandler):
+    """Answers the JSON endpoints. The data source is server.fetch."""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif url.path.startswith("/xray/"):
+                ticker = unquote(url.path[len("/xray/"):])
+                if not TICKER_PATTERN.match(ticker):
+                    self._send_json(400, {"error": f"Invalid ticker symbol: {ticker!r}"})
+                    return
+                self._send_json(200, xray(ticker, fetch=self.server.fetch))
+            elif url.path == "/xray":
+                tickers = [t for t in ",".join(parse_qs(url.query).get("tickers", [])).split(",") if t]
+                invalid = [t for t in tickers if not TICKER_PATTERN.match(t)]
+                if not tickers or invalid or len(tickers) > MAX_TICKERS_PER_REQUEST:
+                    self._send_json(400, {"error": f"Pass 1 to {MAX_TICKERS_PER_REQUEST} valid tickers, e.g. ?tickers=AAPL,MSFT"})
+                    return
+                results = list(self.server.pool.map(lambda t: xray(t, fetch=self.server.fetch), tickers))
+                self._send_json(200, {"results": results})
+            else:
+                self._send_json(404, {"error": "Not found"})
+        except Exception as e:
+            # Any unexpected problem becomes a JSON error instead of a dropped connection.
+            self._send_json(500, {"error": str(e)})
+
+
+# --- 4. Server ---
+
+def make_server(host="127.0.0.1", port=8000, fetch=None, workers=8, source=None):
+    """
+    Create (but do not start) the X-Ray HTTP server.
+
+    Parameters:
+    - host, port: Address to listen on (port 0 picks a free port)
+    - fetch: Function of a ticker returning a FetchResult; pass a stub to
+      serve recorded data without the network (default: fetch_statements()
+      with its own pool of download threads, sized from `workers`)
+    - workers: Threads used to analyse the tickers of a multi-ticker request
+    - source: DataSource for the default fetch (default: the configured one)
+    """
+    server = ThreadingHTTPServer((host, port), XRayHandler)
+    server.daemon_threads = True
+    server.downloads = fetch_pool(workers)
+    server.fetch = fetch or partial(fetch_statements, source=source, executor=server.downloads)
+    server.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xray-service")
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Financial X-Ray as a JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--source", help="'yfinance' or 'local:<snapshot directory>' (default: XRAY_DATA_SOURCE)")
+    args = parser.parse_args(argv)
+
+    source = source_from_spec(args.source) if args.source else None
+    server = make_server(args.host, args.port, workers=args.workers, source=source)
+    print(f"Serving the Financial X-Ray on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.shutdown(wait=False)
+        server.downloads.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()